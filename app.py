@@ -3,27 +3,60 @@
 ###############################
 
 # Import necessary libraries
-from flask import Flask, render_template, request, redirect, url_for, flash
+import os
+import re
+import time
+from functools import wraps
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, g, session, abort
 from flask_login import logout_user, current_user, login_required, login_user
-from extensions import db, login_manager
+from extensions import db, login_manager, init_read_routing, enforce_sqlite_foreign_keys
 #from decorators import access_level_required
 
 #setup
 app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db" 
+# DATABASE_URL lets scripts (seeding, benchmarks) point at another database
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///app.db")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.secret_key = "change-this-secret-key"
+# background job worker threads in this process (0 = run job-worker.py instead)
+app.config["JOB_WORKERS"] = int(os.environ.get("JOB_WORKERS", "2"))
+# optional read replica for public pages (SQLite falls back to a read-only pool on the same file)
+app.config["SQLALCHEMY_READ_DATABASE_URI"] = os.environ.get("READ_DATABASE_URL")
+# after saving, a user's reads stay on the primary this long so they see their own changes
+app.config["READ_YOUR_WRITES_SECONDS"] = 30
+# SMTP relay for result emails as host:port; unset writes them to instance/outbox instead
+app.config["MAIL_SERVER"] = os.environ.get("MAIL_SERVER")
+# public address used in links sent by email (e.g. player invites)
+app.config["APP_BASE_URL"] = os.environ.get("APP_BASE_URL", "http://localhost:5000")
 
 # Initialize extensions with the app-
 db.init_app(app)
 login_manager.init_app(app)
+enforce_sqlite_foreign_keys(app)
+init_read_routing(app)
 # Ensure Flask-Login redirects unauthenticated users to our login page
 login_manager.login_view = 'login'
 login_manager.login_message_category = 'info'
 
-from models import User, Team, Match, Player, Leaderboard
+from models import User, Team, Match, Player, Leaderboard, Job, Notification, MATCH_COMPLETED, MATCH_STATUSES
+from jobs import enqueue, ensure_workers
+from follows import follow_team, unfollow_team, follower_count
+from notifications import unread_count
+from exports import stream_export, matches_query, standings_query, squad_query
+from search import register_search_listeners, search as search_index
+from stats import register_stats_listeners, get_stats, head_to_head, annotate_fixtures
 from datetime import datetime
-import os
+
+# keep the full-text search index in step with team/player/match writes
+register_search_listeners()
+# rebuild cached Stats Centre numbers only when match data changes
+register_stats_listeners()
+
+# season labels like '2025-26' (see models.season_for)
+SEASON_LABEL = re.compile(r'\d{4}-\d{2}')
+
+# most recent matches listed on /tables (full archive via /export/matches.csv)
+TABLES_MATCH_LIMIT = 200
 
 # sponsor image extensions we'll accept
 SPONSOR_EXTS = {'.svg', '.png', '.jpg', '.jpeg', '.webp', '.gif'}
@@ -65,10 +98,39 @@ def _is_safe_redirect(target):
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
+
+
+def read_only(view):
+    """Serve a GET-only page from the read connection pool.
+
+    Users who saved something in the last few seconds stay on the primary
+    so replica lag never hides their own change.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        g.read_only = session.get('rw_until', 0) < time.time()
+        return view(*args, **kwargs)
+    return wrapped
+
+
+@app.before_request
+def start_job_workers():
+    # start in the serving process (not at import: not the reloader parent or a
+    # pre-fork master) so jobs queued, retrying or stranded before a restart run
+    # without waiting for a new job to be enqueued
+    ensure_workers(app)
+
+
+@app.after_request
+def pin_writer_to_primary(response):
+    if g.get('db_wrote') and current_user.is_authenticated:
+        session['rw_until'] = time.time() + app.config['READ_YOUR_WRITES_SECONDS']
+    return response
  
 
 # Defining the Home page route
 @app.route("/")
+@read_only
 def home():
     # fetch the next upcoming match (UTC) to show on the home page
     now = datetime.utcnow()
@@ -76,17 +138,21 @@ def home():
         next_match = Match.query.filter(Match.date_time >= now).order_by(Match.date_time.asc()).first()
         # last 3 completed results (most recent first)
         last_results = Match.query.filter(
-            Match.home_score != None,
-            Match.away_score != None,
+            Match.status == MATCH_COMPLETED,
             Match.date_time < now
         ).order_by(Match.date_time.desc()).limit(3).all()
     except Exception:
         next_match = None
         last_results = []
-    return render_template("home.html", next_match=next_match, last_results=last_results, now=now)
+    try:
+        notes = annotate_fixtures([next_match])
+    except Exception:
+        notes = {}
+    return render_template("home.html", next_match=next_match, last_results=last_results, now=now, notes=notes)
 
 # Defining the Overview page route
 @app.route("/overview")
+@read_only
 def overview():
     # collect sponsor files from static/sponsors (if present)
     sponsors_dir = os.path.join(app.root_path, 'static', 'sponsors')
@@ -106,6 +172,7 @@ def overview():
 
 # Defining the Leaderboards page route
 @app.route("/leaderboards")
+@read_only
 def leaderboards():
     # show public leaderboards ordered by rank (if present) then pts_scored
     try:
@@ -116,22 +183,96 @@ def leaderboards():
 
 # Defining the Fixtures & Results page route
 @app.route("/fixtures-results")
+@read_only
 def fixtures_results():
-    # load matches and split into upcoming and past
+    # load matches and split into upcoming and past, optionally for one season
     now = datetime.utcnow()
+    season = request.args.get('season') or None
     try:
-        upcoming = Match.query.filter(Match.date_time >= now).order_by(Match.date_time.asc()).all()
-        past = Match.query.filter(Match.date_time < now).order_by(Match.date_time.desc()).all()
+        seasons = [s for (s,) in db.session.query(Match.season).filter(Match.season != None)
+                   .distinct().order_by(Match.season.desc())]
+        upcoming_q = Match.query.filter(Match.date_time >= now)
+        past_q = Match.query.filter(Match.date_time < now)
+        if season:
+            upcoming_q = upcoming_q.filter(Match.season == season)
+            past_q = past_q.filter(Match.season == season)
+        upcoming = upcoming_q.order_by(Match.date_time.asc()).all()
+        past = past_q.order_by(Match.date_time.desc()).all()
     except Exception:
+        seasons = []
         upcoming = []
         past = []
+    # recent meetings and form per fixture, from the in-memory index
+    try:
+        notes = annotate_fixtures(upcoming + past)
+    except Exception:
+        notes = {}
 
-    return render_template("fixtures_results.html", upcoming=upcoming, past=past, now=now)
+    return render_template("fixtures_results.html", upcoming=upcoming, past=past, now=now, notes=notes,
+                           seasons=seasons, season=season)
 
 # Defining the Stats centre page route
 @app.route("/stats-centre")
+@read_only
 def stats_centre():
-    return render_template("stats_centre.html")
+    try:
+        stats = get_stats()
+        teams = {t.id: t for t in Team.query.all()}
+    except Exception:
+        stats = {'teams': {}, 'pairs': {}}
+        teams = {}
+    # league-style table of every team with results: most wins, then points difference
+    table = sorted(
+        ((teams[tid], s) for tid, s in stats['teams'].items() if tid in teams),
+        key=lambda row: (-row[1]['won'], -row[1]['pts_diff'], row[0].name),
+    )
+
+    selected_team = None
+    rivals = []
+    team_id = request.args.get('team_id', type=int)
+    if team_id and team_id in teams:
+        selected_team = teams[team_id]
+        for key, pair in stats['pairs'].items():
+            if team_id in key:
+                other = key[1] if key[0] == team_id else key[0]
+                if other in teams:
+                    rivals.append((teams[other], pair))
+        rivals.sort(key=lambda row: (-row[1]['played'], row[0].name))
+
+    match = None
+    h2h = None
+    match_id = request.args.get('match_id', type=int)
+    if match_id:
+        match = Match.query.get(match_id)
+        if match:
+            h2h = head_to_head(match.home_team_id, match.away_team_id, stats)
+
+    return render_template("stats_centre.html", table=table, team_stats=stats['teams'],
+                           selected_team=selected_team, rivals=rivals, match=match, h2h=h2h)
+
+# Defining the Search page route (teams, fixtures and - for staff - players)
+@app.route("/search")
+@read_only
+def search():
+    q = (request.args.get('q') or '').strip()
+    kinds = ['team', 'match']
+    # player names are only searchable by coaches and superadmins
+    if current_user.is_authenticated and current_user.can_edit_matches():
+        kinds.append('player')
+    requested = request.args.get('kind')
+    if requested:
+        kinds = [k for k in kinds if k == requested]
+    try:
+        limit = min(max(int(request.args.get('limit') or 20), 1), 100)
+    except ValueError:
+        limit = 20
+    try:
+        results = search_index(q, kinds=kinds, limit=limit) if q else []
+    except Exception:
+        results = []
+    if request.args.get('format') == 'json':
+        return jsonify(query=q, results=results)
+    return render_template("search.html", q=q, results=results)
 
 # Defining the Tables page route (show non-sensitive DB tables to admins)
 @app.route("/tables")
@@ -141,13 +282,51 @@ def tables():
         flash('You do not have access to view database tables.', 'danger')
         return redirect(url_for('dashboard'))
     try:
-        matches = Match.query.order_by(Match.date_time.desc()).all()
+        # the full archive is available from the streaming exports
+        matches = Match.query.order_by(Match.date_time.desc()).limit(TABLES_MATCH_LIMIT).all()
         leaderboards = Leaderboard.query.order_by(Leaderboard.rank.asc().nullsfirst() if hasattr(Leaderboard, 'rank') else Leaderboard.rank.asc()).all()
     except Exception:
         matches = []
         leaderboards = []
     return render_template("tables.html", matches=matches, leaderboards=leaderboards)
 
+# Streaming exports (admins; squads also for the team's coaches)
+@app.route("/export/matches.<any(csv, json):fmt>")
+@login_required
+@read_only
+def export_matches(fmt):
+    if not _is_admin(current_user):
+        abort(403)
+    season = request.args.get('season') or None
+    # the label also goes into the download filename
+    if season and not SEASON_LABEL.fullmatch(season):
+        abort(400)
+    team_id = request.args.get('team_id', type=int)
+    name = 'matches' + (f'-{season}' if season else '') + (f'-team{team_id}' if team_id else '')
+    return stream_export(matches_query(season, team_id), fmt, name)
+
+
+@app.route("/export/standings.<any(csv, json):fmt>")
+@login_required
+@read_only
+def export_standings(fmt):
+    if not _is_admin(current_user):
+        abort(403)
+    return stream_export(standings_query(), fmt, 'standings')
+
+
+@app.route("/export/squad/<int:team_id>.<any(csv, json):fmt>")
+@login_required
+@read_only
+def export_squad(team_id, fmt):
+    code = db.session.query(Team.code).filter(Team.id == team_id).first()
+    if code is None:
+        abort(404)
+    if not (_is_admin(current_user) or (current_user.is_coach() and
+                                       current_user.coached_teams.filter(Team.id == team_id).count())):
+        abort(403)
+    return stream_export(squad_query(team_id), fmt, f'squad-{code[0] or team_id}')
+
 # Defining the News page route
 @app.route("/news")
 def news():
@@ -191,9 +370,11 @@ def dashboard():
         return redirect(url_for('admin_dashboard'))
     
     # Regular user dashboard with team tracking
-    teams = Team.query.order_by(Team.name).all()
     tracked_teams = current_user.tracked_teams
     tracked_team_ids = [t.id for t in tracked_teams]
+    # archived teams stay listed for their followers so they can unfollow
+    teams = Team.active().order_by(Team.name).all()
+    teams += sorted((t for t in tracked_teams if t.is_archived()), key=lambda t: t.name)
     
     # Get upcoming matches for tracked teams
     now = datetime.utcnow()
@@ -214,21 +395,67 @@ def dashboard():
 @app.route("/dashboard/track/<int:team_id>", methods=['POST'])
 @login_required
 def dashboard_track_team(team_id):
-    team = Team.query.get_or_404(team_id)
-    
-    if team in current_user.tracked_teams:
-        # Unfollow
-        current_user.tracked_teams.remove(team)
-        flash(f'You are no longer following {team.name}.', 'info')
+    # one INSERT/DELETE on the link table - the tracked_teams collection is never loaded
+    team = db.session.query(Team.name, Team.archived_on).filter(Team.id == team_id).first()
+    if team is None:
+        abort(404)
+    name = team.name
+    action = request.form.get('action')
+    if action == 'unfollow':
+        unfollow_team(current_user.id, team_id)
+        following = False
+    elif action != 'follow' and unfollow_team(current_user.id, team_id):
+        # toggled off
+        following = False
+    elif team.archived_on is not None:
+        # archived teams can still be unfollowed, but not followed
+        db.session.rollback()
+        message = f'{name} has been archived and can no longer be followed.'
+        if request.args.get('format') == 'json':
+            return jsonify(team_id=team_id, following=False, error=message), 400
+        flash(message, 'info')
+        return redirect(url_for('dashboard'))
     else:
-        # Follow
-        current_user.tracked_teams.append(team)
-        flash(f'You are now following {team.name}!', 'success')
-    
+        follow_team(current_user.id, team_id)
+        following = True
     db.session.commit()
+
+    if request.args.get('format') == 'json':
+        return jsonify(team_id=team_id, following=following, follower_count=follower_count(team_id))
+    if following:
+        flash(f'You are now following {name}!', 'success')
+    else:
+        flash(f'You are no longer following {name}.', 'info')
     return redirect(url_for('dashboard'))
 
 
+@app.route("/inbox")
+@login_required
+def inbox():
+    notes = Notification.query.filter_by(user_id=current_user.id).order_by(
+        Notification.created_on.desc(), Notification.id.desc()).limit(50).all()
+    return render_template("inbox.html", notes=notes, unread=unread_count(current_user.id))
+
+
+@app.route("/inbox/read", methods=['POST'])
+@login_required
+def inbox_mark_read():
+    db.session.execute(db.update(Notification).where(
+        Notification.user_id == current_user.id, Notification.read_on == None
+    ).values(read_on=datetime.utcnow()))
+    db.session.commit()
+    return redirect(url_for('inbox'))
+
+
+@app.route("/inbox/settings", methods=['POST'])
+@login_required
+def inbox_settings():
+    current_user.notify_by_email = bool(request.form.get('notify_by_email'))
+    db.session.commit()
+    flash('Notification settings saved.', 'success')
+    return redirect(url_for('inbox'))
+
+
 # Superadmin: assign coaches to a team
 @app.route('/admin/team/<int:team_id>/coaches', methods=['GET', 'POST'])
 @login_required
@@ -266,7 +493,31 @@ def coach_team_players(team_id):
         flash('You do not have permission to manage players for this team.', 'danger')
         return redirect(url_for('dashboard'))
     players = Player.query.filter_by(team_id=team_id).all()
-    if request.method == 'POST':
+    if request.method == 'POST' and request.form.get('bulk'):
+        # one player per line: name, email[, squad number[, position]]; players
+        # are emailed a link to set their own password (see jobs.create_players)
+        rows = []
+        for n, line in enumerate(request.form.get('bulk').splitlines(), start=1):
+            if not line.strip():
+                continue
+            parts = [p.strip() for p in line.split(',')]
+            if len(parts) < 2 or len(parts) > 4 or '@' not in parts[1]:
+                flash(f'Line {n}: expected name, email[, squad number[, position]].', 'danger')
+                return render_template('coach_players.html', team=t, players=players)
+            parts += [''] * (4 - len(parts))
+            rows.append({'name': parts[0], 'email': parts[1], 'squad_number': parts[2], 'position': parts[3]})
+        if not rows:
+            flash('No players to create.', 'danger')
+            return render_template('coach_players.html', team=t, players=players)
+        try:
+            job = enqueue('create_players', created_by=current_user.email,
+                          team_id=team_id, players=rows, added_by=current_user.email)
+            flash(f'Creating {len(rows)} players in the background (job #{job.id}).', 'success')
+            return redirect(url_for('admin_job', job_id=job.id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error queueing players: {e}', 'danger')
+    elif request.method == 'POST':
         # create a new player user and player profile
         email = (request.form.get('email') or '').strip()
         name = (request.form.get('name') or '').strip()
@@ -305,7 +556,7 @@ def admin_dashboard():
         return redirect(url_for('dashboard'))
     # provide some quick counts for admin overview
     try:
-        team_count = Team.query.count()
+        team_count = Team.active().count()
         match_count = Match.query.count()
         upcoming_count = Match.query.filter(Match.date_time >= datetime.utcnow()).count()
         past_count = Match.query.filter(Match.date_time < datetime.utcnow()).count()
@@ -314,6 +565,30 @@ def admin_dashboard():
     return render_template('dashboard_admin.html', team_count=team_count, match_count=match_count, upcoming_count=upcoming_count, past_count=past_count)
 
 
+# Background jobs: superadmins see every job, coaches the jobs they queued
+@app.route('/admin/jobs')
+@login_required
+def admin_jobs():
+    if not (current_user.is_superadmin() or current_user.can_edit_matches()):
+        flash('You do not have access to the admin area.', 'danger')
+        return redirect(url_for('dashboard'))
+    q = Job.query
+    if not current_user.is_superadmin():
+        q = q.filter(Job.created_by == current_user.email)
+    jobs = q.order_by(Job.id.desc()).limit(100).all()
+    return render_template('admin_jobs.html', jobs=jobs)
+
+
+@app.route('/admin/jobs/<int:job_id>')
+@login_required
+def admin_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    if not (current_user.is_superadmin() or job.created_by == current_user.email):
+        flash('You do not have access to that job.', 'danger')
+        return redirect(url_for('dashboard'))
+    return render_template('admin_job.html', job=job)
+
+
 @app.route('/admin/leaderboards', methods=['GET', 'POST'])
 @login_required
 def admin_leaderboards():
@@ -349,12 +624,9 @@ def admin_leaderboards():
             lb = Leaderboard(team=team, pl=pl, w=w, d=d, l=l, pts_f=pts_f, pts_ag=pts_ag, pts_diff=pts_diff, g_pts=g_pts, b_pts=b_pts, total=total, pts_scored=pts_scored)
             db.session.add(lb)
             db.session.commit()
-            # recompute ranks ordered by pts_scored desc
-            rows = Leaderboard.query.order_by(Leaderboard.pts_scored.desc()).all()
-            for idx, row in enumerate(rows, start=1):
-                row.rank = idx
-            db.session.commit()
-            flash('Leaderboard row added and ranks updated.', 'success')
+            # recompute ranks ordered by pts_scored desc in the background
+            enqueue('recompute_ranks', created_by=current_user.email)
+            flash('Leaderboard row added; ranks are being updated.', 'success')
             return redirect(url_for('admin_leaderboards'))
         except Exception as e:
             db.session.rollback()
@@ -394,13 +666,10 @@ def admin_leaderboards_edit(row_id):
         
         db.session.commit()
         
-        # recompute ranks
-        rows = Leaderboard.query.order_by(Leaderboard.pts_scored.desc()).all()
-        for idx, r in enumerate(rows, start=1):
-            r.rank = idx
-        db.session.commit()
+        # recompute ranks in the background
+        enqueue('recompute_ranks', created_by=current_user.email)
         
-        flash('Leaderboard row updated and ranks recalculated.', 'success')
+        flash('Leaderboard row updated; ranks are being recalculated.', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error updating leaderboard row: {e}', 'danger')
@@ -422,13 +691,10 @@ def admin_leaderboards_delete(row_id):
         db.session.delete(row)
         db.session.commit()
         
-        # recompute ranks
-        rows = Leaderboard.query.order_by(Leaderboard.pts_scored.desc()).all()
-        for idx, r in enumerate(rows, start=1):
-            r.rank = idx
-        db.session.commit()
+        # recompute ranks in the background
+        enqueue('recompute_ranks', created_by=current_user.email)
         
-        flash(f'Leaderboard row for {team_name} deleted and ranks recalculated.', 'success')
+        flash(f'Leaderboard row for {team_name} deleted; ranks are being recalculated.', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error deleting leaderboard row: {e}', 'danger')
@@ -452,7 +718,7 @@ def admin_matches():
         ).order_by(Match.date_time.desc()).all()
     else:
         matches = Match.query.order_by(Match.date_time.desc()).all()
-    teams = Team.query.order_by(Team.name).all()
+    teams = Team.active().order_by(Team.name).all()
     return render_template('admin_matches.html', matches=matches, teams=teams)
 
 
@@ -463,7 +729,11 @@ def admin_teams():
     if not current_user.is_superadmin():
         flash('You do not have access to the admin area.', 'danger')
         return redirect(url_for('dashboard'))
-    teams = Team.query.order_by(Team.name).all()
+    # archived teams are listed last so they can be restored or purged
+    if request.args.get('sort') == 'followers':
+        teams = Team.query.order_by(Team.archived_on != None, Team.follower_count.desc(), Team.name).all()
+    else:
+        teams = Team.query.order_by(Team.archived_on != None, Team.name).all()
     return render_template('admin_teams.html', teams=teams)
 
 
@@ -524,15 +794,37 @@ def admin_team_delete(team_id):
         return redirect(url_for('dashboard'))
     t = Team.query.get_or_404(team_id)
     try:
-        db.session.delete(t)
-        db.session.commit()
-        flash('Team deleted.', 'success')
+        if request.form.get('mode') == 'archive':
+            # soft delete: hide the team but keep its matches, players and links
+            t.archived_on = datetime.utcnow()
+            db.session.commit()
+            flash(f'{t.name} archived. Its results stay on record.', 'success')
+        else:
+            job = enqueue('delete_team', created_by=current_user.email, team_id=t.id)
+            flash(f'Deletion of {t.name} queued (job #{job.id}).', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error deleting team: {e}', 'danger')
     return redirect(url_for('admin_teams'))
 
 
+@app.route('/admin/team/<int:team_id>/restore', methods=['POST'])
+@login_required
+def admin_team_restore(team_id):
+    if not current_user.is_superadmin():
+        flash('You do not have access to the admin area.', 'danger')
+        return redirect(url_for('dashboard'))
+    t = Team.query.get_or_404(team_id)
+    try:
+        t.archived_on = None
+        db.session.commit()
+        flash(f'{t.name} restored.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error restoring team: {e}', 'danger')
+    return redirect(url_for('admin_teams'))
+
+
 @app.route('/admin/match/new', methods=['GET', 'POST'])
 @login_required
 def admin_match_new():
@@ -540,7 +832,7 @@ def admin_match_new():
     if not (current_user.can_edit_matches() or current_user.can_manage_teams()):
         flash('You do not have access to create matches.', 'danger')
         return redirect(url_for('dashboard'))
-    teams = Team.query.order_by(Team.name).all()
+    teams = Team.active().order_by(Team.name).all()
     if request.method == 'POST':
         try:
             home_team_id = int(request.form.get('home_team'))
@@ -556,6 +848,8 @@ def admin_match_new():
                     flash('Coaches may only create matches for teams they coach.', 'danger')
                     return render_template('admin_match_form.html', teams=teams, match=None)
             m = Match(home_team_id=home_team_id, away_team_id=away_team_id, date_time=date_time, location=location)
+            if request.form.get('status') in MATCH_STATUSES:
+                m.status = request.form.get('status')
             db.session.add(m)
             db.session.commit()
             flash('Match created.', 'success')
@@ -580,6 +874,7 @@ def admin_match_edit(match_id):
             return redirect(url_for('admin_matches'))
     teams = Team.query.order_by(Team.name).all()
     if request.method == 'POST':
+        before = (m.home_score, m.away_score)
         try:
             m.home_team_id = int(request.form.get('home_team'))
             m.away_team_id = int(request.form.get('away_team'))
@@ -591,7 +886,15 @@ def admin_match_edit(match_id):
             ascore = request.form.get('away_score')
             m.home_score = int(hs) if hs not in (None, '', 'None') else None
             m.away_score = int(ascore) if ascore not in (None, '', 'None') else None
+            # only scheduled/postponed can be chosen; a full score always means completed
+            status = request.form.get('status')
+            if status in MATCH_STATUSES:
+                m.status = status
             db.session.commit()
+            # followers hear about a new or corrected final score from a background job
+            if m.status == MATCH_COMPLETED and (m.home_score, m.away_score) != before:
+                enqueue('notify_result', created_by=current_user.email,
+                        match_id=m.id, home_score=m.home_score, away_score=m.away_score)
             flash('Match updated.', 'success')
             return redirect(url_for('admin_matches'))
         except Exception as e:
@@ -667,6 +970,28 @@ def login():
     return render_template("login.html")
 
 
+@app.route("/set-password/<token>", methods=["GET", "POST"])
+def set_password(token):
+    # landing page for emailed invite links (see jobs.create_players)
+    user = User.from_password_token(token)
+    if user is None:
+        flash("That link has expired or has already been used.", "danger")
+        return redirect(url_for('login'))
+    if request.method == "POST":
+        password = request.form.get("password") or ""
+        if len(password) < 8:
+            flash("Please choose a password of at least 8 characters.", "danger")
+        elif password != request.form.get("confirm"):
+            flash("The passwords don't match.", "danger")
+        else:
+            user.set_password(password)
+            db.session.commit()
+            login_user(user)
+            flash("Password set - welcome!", "success")
+            return redirect(url_for('dashboard'))
+    return render_template("set_password.html", user=user, token=token)
+
+
 @app.route('/logout')
 def logout():
     try:
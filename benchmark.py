@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Measure per-route throughput and latency in-process with Flask's test
+# client (no network, no web server). Seed a scratch database first:
+#
+#   DATABASE_URL=sqlite:///bench.db python seed-data.py --reset
+#   DATABASE_URL=sqlite:///bench.db python benchmark.py
+#   DATABASE_URL=sqlite:///bench.db python benchmark.py --compare benchmarks/<earlier>.json
+#
+# Results are written to benchmarks/ as JSON so runs can be compared.
+
+parser = argparse.ArgumentParser(description="Benchmark app routes with the Flask test client.")
+parser.add_argument("-n", "--requests", type=int, default=200, help="timed requests per route")
+parser.add_argument("--warmup", type=int, default=10, help="untimed requests per route first")
+parser.add_argument("--only", help="comma-separated route names to run")
+parser.add_argument("--compare", help="earlier results file to compare against")
+parser.add_argument("--threshold", type=float, default=10.0,
+                    help="%% slowdown in p95 latency reported as a regression")
+parser.add_argument("--out", default="benchmarks", help="directory for result files")
+args = parser.parse_args()
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench.db")
+# benchmarks shouldn't race background workers for the database
+os.environ.setdefault("JOB_WORKERS", "0")
+
+from app import app
+from models import Job, Match, Player, Team, User
+
+PASSWORD = "password"
+
+
+def pick_fixtures():
+    """Ids and accounts the parameterised routes need, from the seeded data."""
+    with app.app_context():
+        team = Team.query.order_by(Team.id).first()
+        match = Match.query.order_by(Match.id.desc()).first()
+        follower = User.query.filter(User.access_level == 'regular').join(User.tracked_teams).order_by(User.id).first()
+        player = Player.query.join(User).order_by(Player.id).first()
+        job = Job.query.order_by(Job.id).first()
+        if not (team and match and follower and player and job):
+            sys.exit("No seeded data found - run seed-data.py against this DATABASE_URL first.")
+        return {
+            "team_id": team.id,
+            "team_word": team.name.split()[0][:4],
+            "match_id": match.id,
+            "job_id": job.id,
+            "follower": follower.email,
+            "player": player.user.email,
+            "coach": f"coach{team.id}@example.com",
+        }
+
+
+ADMIN = "bench-admin@example.com"
+# GET endpoints that aren't pages to time (set_password needs an emailed token)
+SKIP = {"static", "logout", "set_password"}
+
+
+def login_for(endpoint, f):
+    """Account a route is benchmarked as (None = anonymous)."""
+    if endpoint.startswith(("admin", "export")) or endpoint == "tables":
+        return ADMIN
+    if endpoint in ("dashboard", "inbox", "whoami"):
+        return f["follower"]
+    if endpoint == "coach_team_players":
+        return f["coach"]
+    return None
+
+
+def routes(f):
+    """(name, login as, path) for every GET route in the app.
+
+    Routes without URL arguments come straight from app.url_map; the
+    parameterised ones and extra variants are listed below. Any GET route
+    missing from the result is reported so the list can't silently drift.
+    """
+    overrides = {"search": f"/search?q={f['team_word']}"}
+    found = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if "GET" in rule.methods and not rule.arguments and rule.endpoint not in SKIP:
+            found.append((rule.endpoint, login_for(rule.endpoint, f), overrides.get(rule.endpoint, rule.rule)))
+    t, m = f["team_id"], f["match_id"]
+    found += [
+        ("stats_centre_team", None, f"/stats-centre?team_id={t}"),
+        ("stats_centre_match", None, f"/stats-centre?match_id={m}"),
+        ("search_json", None, f"/search?q={f['team_word']}&format=json"),
+        ("dashboard_player", f["player"], "/dashboard"),
+        ("coach_team_players", f["coach"], f"/coach/team/{t}/players"),
+        ("admin_job", ADMIN, f"/admin/jobs/{f['job_id']}"),
+        ("admin_match_edit", ADMIN, f"/admin/match/{m}/edit"),
+        ("admin_team_edit", ADMIN, f"/admin/team/{t}/edit"),
+        ("admin_team_coaches", ADMIN, f"/admin/team/{t}/coaches"),
+        ("export_matches", ADMIN, "/export/matches.csv"),
+        ("export_matches_json", ADMIN, "/export/matches.json"),
+        ("export_standings", ADMIN, "/export/standings.csv"),
+        ("export_standings_json", ADMIN, "/export/standings.json"),
+        ("export_squad", f["coach"], f"/export/squad/{t}.csv"),
+        ("export_squad_json", f["coach"], f"/export/squad/{t}.json"),
+    ]
+    covered = {name for name, _, _ in found}
+    missing = sorted(r.endpoint for r in app.url_map.iter_rules()
+                     if "GET" in r.methods and r.endpoint not in SKIP and r.endpoint not in covered)
+    if missing:
+        print(f"Not benchmarked (add to routes()): {', '.join(missing)}")
+    return found
+
+
+def client_for(email, clients):
+    if email not in clients:
+        c = app.test_client()
+        if email:
+            r = c.post("/log-in", data={"email": email, "password": PASSWORD})
+            if r.status_code != 302:
+                sys.exit(f"Could not log in as {email}")
+        clients[email] = c
+    return clients[email]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def bench(client, path, n, warmup):
+    for _ in range(warmup):
+        client.get(path).get_data()
+    timings = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = client.get(path)
+        # read the whole body so streamed responses are timed to the last byte
+        r.get_data()
+        timings.append((time.perf_counter() - t0) * 1000.0)
+        if r.status_code != 200:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        "requests": n,
+        "errors": errors,
+        "rps": round(n / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p90_ms": round(percentile(timings, 90), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+        "max_ms": round(timings[-1], 2),
+    }
+
+
+def row_counts():
+    with app.app_context():
+        return {
+            "teams": Team.query.count(),
+            "matches": Match.query.count(),
+            "users": User.query.count(),
+            "players": Player.query.count(),
+        }
+
+
+def main():
+    fixtures = pick_fixtures()
+    selected = set(args.only.split(",")) if args.only else None
+    clients = {}
+    results = {}
+    print(f"{'route':<22}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}")
+    for name, email, path in routes(fixtures):
+        if selected and name not in selected:
+            continue
+        res = bench(client_for(email, clients), path, args.requests, args.warmup)
+        res["path"] = path
+        results[name] = res
+        print(f"{name:<22}{res['rps']:>9.1f}{res['p50_ms']:>9.2f}{res['p95_ms']:>9.2f}{res['p99_ms']:>9.2f}{res['errors']:>6}")
+
+    run = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "database": app.config["SQLALCHEMY_DATABASE_URI"],
+        "python": platform.python_version(),
+        "requests_per_route": args.requests,
+        "rows": row_counts(),
+        "routes": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"bench-{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+    with open(out_path, "w") as fh:
+        json.dump(run, fh, indent=2)
+    print(f"\nSaved {out_path}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)["routes"]
+        regressions = 0
+        print(f"\n{'route':<22}{'p95 before':>12}{'p95 now':>10}{'change':>9}")
+        for name, res in results.items():
+            before = baseline.get(name)
+            if not before or not before["p95_ms"]:
+                continue
+            change = (res["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100.0
+            flag = "  REGRESSION" if change > args.threshold else ""
+            regressions += bool(flag)
+            print(f"{name:<22}{before['p95_ms']:>12.2f}{res['p95_ms']:>10.2f}{change:>8.1f}%{flag}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 from app import app
 from extensions import db
+from search import rebuild_search_index
 
 # Create all database tables
 with app.app_context():
     db.drop_all()
-    db.create_all()
\ No newline at end of file
+    db.create_all()
+    # full-text search index (FTS5 on SQLite, tsvector on Postgres)
+    with db.engine.begin() as conn:
+        rebuild_search_index(conn)
@@ -0,0 +1,52 @@
+from app import app
+from extensions import db
+from follows import recount_followers
+from models import MATCH_SCHEDULED, backfill_match_columns
+from search import INDEX_TABLE, rebuild_search_index
+from sqlalchemy import inspect, text
+
+# Bring an existing database up to date with the models, leaving data in
+# place: create missing tables, add newly introduced columns (filling in the
+# derived ones), create any missing indexes and build the search index if
+# the database predates it. Use db-setup.py for a fresh database.
+# Foreign key ON DELETE rules can't be added to existing SQLite tables: a
+# database created before them keeps plain foreign keys (an ORM delete that
+# would orphan rows fails) until it is rebuilt with db-setup.py and reloaded.
+NEW_COLUMNS = {
+    'match': {
+        'status': f"VARCHAR(16) NOT NULL DEFAULT '{MATCH_SCHEDULED}'",
+        'result': 'VARCHAR(8)',
+        'season': 'VARCHAR(9)',
+    },
+    'team': {'archived_on': 'TIMESTAMP', 'follower_count': 'INTEGER NOT NULL DEFAULT 0'},
+    'user': {'notify_by_email': 'BOOLEAN NOT NULL DEFAULT FALSE'},
+}
+# columns derived from existing rows, filled in once all columns are added
+BACKFILLS = {
+    ('match', 'status'): backfill_match_columns,
+    ('team', 'follower_count'): recount_followers,
+}
+
+with app.app_context():
+    db.create_all()
+    # backfills run once every new column exists, and indexes last since
+    # some cover the new columns
+    with db.engine.begin() as conn:
+        pending = []
+        for table, columns in NEW_COLUMNS.items():
+            existing = {c['name'] for c in inspect(conn).get_columns(table)}
+            for name, ddl in columns.items():
+                if name not in existing:
+                    conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {name} {ddl}'))
+                    print(f"Added {table}.{name}")
+                    if (table, name) in BACKFILLS:
+                        pending.append(BACKFILLS[(table, name)])
+        for backfill in pending:
+            backfill(conn)
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        if not inspect(conn).has_table(INDEX_TABLE):
+            rebuild_search_index(conn)
+            print("Built search index")
+    print("Database schema is up to date.")
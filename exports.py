@@ -0,0 +1,99 @@
+"""Streaming CSV/JSON exports of matches, standings and squads.
+
+Each export is a plain column SELECT run with `yield_per`, so rows come
+off a server-side cursor in batches of EXPORT_BATCH (no ORM objects, no
+full result list) and every batch is written out as one chunk of the HTTP
+response. Memory stays flat however many seasons are exported, and the
+first bytes go out as soon as the first batch is read.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import Leaderboard, Match, Player, Team, User
+
+# rows fetched from the cursor (and sent as one response chunk) at a time
+EXPORT_BATCH = 500
+
+MIMETYPES = {'csv': 'text/csv', 'json': 'application/json'}
+
+
+def matches_query(season=None, team_id=None):
+    home, away = aliased(Team), aliased(Team)
+    stmt = select(
+        Match.id.label('id'), Match.season.label('season'), Match.date_time.label('date_time'),
+        home.name.label('home_team'), away.name.label('away_team'),
+        Match.home_score.label('home_score'), Match.away_score.label('away_score'),
+        Match.status.label('status'), Match.result.label('result'), Match.location.label('location'),
+    ).join(home, home.id == Match.home_team_id).join(away, away.id == Match.away_team_id)
+    if season:
+        stmt = stmt.where(Match.season == season)
+    if team_id:
+        stmt = stmt.where((Match.home_team_id == team_id) | (Match.away_team_id == team_id))
+    return stmt.order_by(Match.date_time, Match.id)
+
+
+def standings_query():
+    cols = ('rank', 'team', 'pl', 'w', 'd', 'l', 'pts_f', 'pts_ag', 'pts_diff',
+            'g_pts', 'b_pts', 'total', 'pts_scored')
+    return select(*(getattr(Leaderboard, c).label(c) for c in cols)).order_by(
+        Leaderboard.rank.asc().nullslast(), Leaderboard.pts_scored.desc(), Leaderboard.id)
+
+
+def squad_query(team_id):
+    return select(
+        Player.id.label('id'), User.name.label('name'), User.email.label('email'),
+        Player.squad_number.label('squad_number'), Player.position.label('position'),
+        Player.joined_on.label('joined_on'),
+    ).join(User, User.id == Player.user_id).where(Player.team_id == team_id).order_by(User.name, Player.id)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _batches(stmt):
+    """Column names and an iterator of row batches read from a server-side cursor."""
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH))
+    return list(result.keys()), result.partitions()
+
+
+def _csv_chunks(stmt):
+    keys, batches = _batches(stmt)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(keys)
+    yield buf.getvalue()
+    for rows in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue()
+
+
+def _json_chunks(stmt):
+    keys, batches = _batches(stmt)
+    sep = '['
+    for rows in batches:
+        yield sep + ',\n'.join(json.dumps({k: _json_value(v) for k, v in zip(keys, row)}) for row in rows)
+        sep = ',\n'
+    yield '[]\n' if sep == '[' else ']\n'
+
+
+def stream_export(stmt, fmt, filename):
+    """Chunked download of `stmt` as CSV or a JSON array of objects."""
+    chunks = _csv_chunks(stmt) if fmt == 'csv' else _json_chunks(stmt)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -1,6 +1,96 @@
+import os
+
+from flask import current_app, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+
+class RoutingSession(Session):
+    """Session that sends reads from read-only requests to the read engine.
+
+    Routes marked with `read_only` (see app.py) set `g.read_only`; their
+    SELECTs use the separate read pool set up by `init_read_routing`.
+    Flushes and explicit write statements always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _wants_read_engine(clause):
+            engine = current_app.extensions.get('read_engine')
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _wants_read_engine(clause):
+    if not (has_request_context() and g.get('read_only')):
+        return False
+    # UPDATE/DELETE/INSERT issued through the session stay on the primary
+    return not (getattr(clause, 'is_dml', False) or getattr(clause, 'is_ddl', False))
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _note_write(session):
+    # lets the app pin this user to the primary for a while (read-your-writes)
+    if has_request_context():
+        g.db_wrote = True
+
 
 # Extension instances used across the app to avoid circular imports
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
+
+
+def enforce_sqlite_foreign_keys(app):
+    """Turn on SQLite foreign key enforcement (off by default) for every connection.
+
+    With it on, the `ondelete` rules in models.py apply, and a delete that
+    would orphan rows fails instead of succeeding silently.
+    """
+    if make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'sqlite':
+        return
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def _sqlite_foreign_keys(dbapi_conn, record):
+            dbapi_conn.execute('PRAGMA foreign_keys=ON')
+
+
+def _sqlite_read_url(app, url):
+    # same file opened read-only: readers can't take write locks
+    path = url.database
+    if not path or path == ':memory:':
+        return None
+    if not os.path.isabs(path):
+        path = os.path.join(app.instance_path, path)
+    if not os.path.exists(path):
+        return None
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+
+def init_read_routing(app):
+    """Create the read engine used by read-only requests.
+
+    SQLALCHEMY_READ_DATABASE_URI points at a replica (e.g. a Postgres
+    standby). Without it, a SQLite primary gets a `mode=ro` connection pool
+    on the same file; other databases just read from the primary.
+    """
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    read_url = app.config.get('SQLALCHEMY_READ_DATABASE_URI')
+    if not read_url and url.get_backend_name() == 'sqlite':
+        read_url = _sqlite_read_url(app, url)
+    with app.app_context():
+        if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+            # WAL lets the read pool keep reading while the primary writes
+            @event.listens_for(db.engine, 'connect')
+            def _sqlite_wal(dbapi_conn, record):
+                dbapi_conn.execute('PRAGMA journal_mode=WAL')
+
+            if read_url and not app.config.get('SQLALCHEMY_READ_DATABASE_URI'):
+                # open the primary first so the -wal/-shm files exist for
+                # read-only connections, which can't create them
+                with db.engine.connect():
+                    pass
+    app.extensions['read_engine'] = create_engine(read_url) if read_url else None
+    return app.extensions['read_engine']
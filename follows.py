@@ -0,0 +1,72 @@
+"""Following teams without loading the user's tracked-team collection.
+
+Follow and unfollow are single statements against `user_tracked_teams`
+(an INSERT ... ON CONFLICT DO NOTHING, or a DELETE), and `Team.follower_count`
+is adjusted in the same transaction only when a row actually changed, so
+"most followed" listings read one column instead of counting the
+association table.
+"""
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Team, user_tracked_teams
+
+
+def _insert_follow(conn, user_id, team_id):
+    """Insert the link if missing; returns True if a row was added."""
+    values = {'user_id': user_id, 'team_id': team_id}
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        res = conn.execute(dialect_insert(user_tracked_teams).values(**values).on_conflict_do_nothing())
+        return res.rowcount == 1
+    # other backends: plain insert, a duplicate key means we already follow
+    try:
+        with conn.begin_nested():
+            conn.execute(insert(user_tracked_teams).values(**values))
+    except IntegrityError:
+        return False
+    return True
+
+
+def _bump(conn, team_id, delta):
+    conn.execute(update(Team.__table__).where(Team.__table__.c.id == team_id)
+                 .values(follower_count=Team.__table__.c.follower_count + delta))
+
+
+def follow_team(user_id, team_id):
+    """Follow a team; returns True if the user wasn't following it already."""
+    conn = db.session.connection()
+    added = _insert_follow(conn, user_id, team_id)
+    if added:
+        _bump(conn, team_id, 1)
+    return added
+
+
+def unfollow_team(user_id, team_id):
+    """Stop following a team; returns True if the user was following it."""
+    conn = db.session.connection()
+    res = conn.execute(delete(user_tracked_teams).where(
+        user_tracked_teams.c.user_id == user_id, user_tracked_teams.c.team_id == team_id))
+    if res.rowcount:
+        _bump(conn, team_id, -1)
+    return bool(res.rowcount)
+
+
+def follower_count(team_id):
+    return db.session.query(Team.follower_count).filter(Team.id == team_id).scalar() or 0
+
+
+def recount_followers(conn):
+    """Recompute every team's follower_count from the association table.
+
+    For bulk loads (seeding, upgrades) that bypass follow_team().
+    """
+    team = Team.__table__
+    counted = select(func.count()).where(user_tracked_teams.c.team_id == team.c.id).scalar_subquery()
+    conn.execute(update(team).values(follower_count=counted))
@@ -0,0 +1,20 @@
+import os
+
+# this process runs the jobs itself; set before importing the app
+os.environ.setdefault("JOB_WORKERS", "0")
+
+from app import app
+from jobs import ensure_workers, stop_workers
+
+# Run background jobs outside the web server. Start the web app with
+# JOB_WORKERS=0 so only this process (and any copies of it) claims jobs.
+THREADS = int(os.environ.get("JOB_WORKER_THREADS", "2"))
+
+if __name__ == "__main__":
+    workers = ensure_workers(app, count=THREADS)
+    print(f"Job worker running with {len(workers)} threads. Ctrl+C to stop.")
+    try:
+        for t in workers:
+            t.join()
+    except KeyboardInterrupt:
+        stop_workers(timeout=10)
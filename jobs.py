@@ -0,0 +1,272 @@
+"""Lightweight background job queue backed by the `job` table.
+
+Admin routes call `enqueue()` and return straight away; a small pool of
+worker threads (started on the web process's first request, or run
+separately with job-worker.py) claims queued jobs with a conditional
+UPDATE, runs the registered handler and records the outcome. Failed jobs are retried with
+exponential backoff up to `max_attempts`.
+"""
+
+import logging
+import secrets
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, or_, update
+
+from extensions import db
+from mailer import send_emails
+from models import (
+    Job, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, PASSWORD_TOKEN_MAX_AGE,
+    Leaderboard, Team, User, Player, Match, Notification, team_coaches, user_tracked_teams,
+)
+from search import reindex, unindex
+from stats import reset_after_bulk_write
+
+log = logging.getLogger(__name__)
+
+# seconds an idle worker sleeps before checking for new jobs
+POLL_INTERVAL = 2.0
+# a running job untouched for this long is assumed lost (worker died) and re-queued
+RUNNING_TIMEOUT = timedelta(minutes=10)
+# first retry delay in seconds; doubled on each further attempt
+RETRY_BASE_DELAY = 5
+# payload keys that are blanked once a job reaches a final state
+SENSITIVE_KEYS = {'password', 'password_hash'}
+
+_handlers = {}
+_wakeup = threading.Event()
+_stop = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def job_handler(kind):
+    """Register a function as the handler for jobs of `kind`.
+
+    The handler is called with the job payload as keyword arguments inside
+    an app context, commits its own work and may return a short summary.
+    """
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(kind, created_by=None, max_attempts=3, **payload):
+    """Queue a job and wake a worker. Commits the current session."""
+    if kind not in _handlers:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job = Job(kind=kind, payload=payload, created_by=created_by, max_attempts=max_attempts)
+    db.session.add(job)
+    db.session.commit()
+    ensure_workers(current_app._get_current_object())
+    _wakeup.set()
+    return job
+
+
+def _claimable(now):
+    return or_(
+        and_(Job.status == JOB_QUEUED, Job.run_after <= now),
+        and_(Job.status == JOB_RUNNING, Job.started_on < now - RUNNING_TIMEOUT),
+    )
+
+
+def claim_next():
+    """Atomically mark the next due job as running and return it (or None)."""
+    now = datetime.utcnow()
+    candidates = db.session.query(Job.id).filter(_claimable(now)).order_by(
+        Job.run_after.asc(), Job.id.asc()).limit(5).all()
+    for (job_id,) in candidates:
+        # only one worker's UPDATE can match while the job is still claimable
+        res = db.session.execute(
+            update(Job).where(Job.id == job_id, _claimable(now)).values(
+                status=JOB_RUNNING, started_on=now, attempts=Job.attempts + 1)
+        )
+        db.session.commit()
+        if res.rowcount == 1:
+            return db.session.get(Job, job_id)
+    return None
+
+
+def _scrub(value):
+    if isinstance(value, dict):
+        return {k: ('' if k in SENSITIVE_KEYS else _scrub(v)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_scrub(v) for v in value]
+    return value
+
+
+def run_job(job):
+    """Run a claimed job and record success, retry or failure."""
+    job_id = job.id
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {job.kind!r}')
+        if job.attempts > job.max_attempts:
+            raise RuntimeError('Job timed out on its final attempt')
+        result = handler(**(job.payload or {}))
+        job = db.session.get(Job, job_id)
+        job.status = JOB_DONE
+        job.result = str(result) if result is not None else None
+        job.error = None
+        job.finished_on = datetime.utcnow()
+        job.payload = _scrub(job.payload)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.error = traceback.format_exc(limit=5)
+        if handler is not None and job.attempts < job.max_attempts:
+            job.status = JOB_QUEUED
+            job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = JOB_FAILED
+            job.finished_on = datetime.utcnow()
+            job.payload = _scrub(job.payload)
+        db.session.commit()
+        log.warning('Job %s (%s) attempt %s failed', job_id, job.kind, job.attempts)
+    return job
+
+
+def _worker_loop(app):
+    while not _stop.is_set():
+        ran = False
+        with app.app_context():
+            try:
+                job = claim_next()
+                if job is not None:
+                    run_job(job)
+                    ran = True
+            except Exception:
+                db.session.rollback()
+                log.exception('Job worker error')
+            finally:
+                db.session.remove()
+        if not ran:
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+
+
+def ensure_workers(app, count=None):
+    """Start the in-process worker threads once (JOB_WORKERS=0 disables them)."""
+    if _workers:
+        return _workers
+    count = app.config.get('JOB_WORKERS', 2) if count is None else count
+    with _workers_lock:
+        if _workers or count <= 0:
+            return _workers
+        _stop.clear()
+        for n in range(count):
+            t = threading.Thread(target=_worker_loop, args=(app,), name=f'job-worker-{n}', daemon=True)
+            t.start()
+            _workers.append(t)
+    return _workers
+
+
+def stop_workers(timeout=None):
+    _stop.set()
+    _wakeup.set()
+    with _workers_lock:
+        for t in _workers:
+            t.join(timeout)
+        _workers.clear()
+
+
+# ---------------------------------------------------------------------------
+# Job handlers
+# ---------------------------------------------------------------------------
+
+@job_handler('recompute_ranks')
+def recompute_ranks():
+    """Rank leaderboard rows by pts_scored with one bulk UPDATE."""
+    ids = [row_id for (row_id,) in db.session.query(Leaderboard.id).order_by(
+        Leaderboard.pts_scored.desc(), Leaderboard.id.asc())]
+    if ids:
+        db.session.execute(update(Leaderboard), [{'id': row_id, 'rank': rank} for rank, row_id in enumerate(ids, start=1)])
+    db.session.commit()
+    return f'Ranked {len(ids)} leaderboard rows.'
+
+
+@job_handler('delete_team')
+def delete_team(team_id):
+    """Permanently delete a team and everything hanging off it.
+
+    A handful of set-based statements in one transaction: follower and
+    coach links and the team's matches (and their notifications) are
+    deleted, players are detached (their accounts stay), then the team
+    row goes.
+    """
+    name = db.session.query(Team.name).filter(Team.id == team_id).scalar()
+    if name is None:
+        return 'Team was already deleted.'
+    match_ids = [m for (m,) in db.session.query(Match.id).filter(
+        (Match.home_team_id == team_id) | (Match.away_team_id == team_id))]
+    player_ids = [p for (p,) in db.session.query(Player.id).filter(Player.team_id == team_id)]
+
+    follows = db.session.execute(delete(user_tracked_teams).where(user_tracked_teams.c.team_id == team_id))
+    db.session.execute(delete(team_coaches).where(team_coaches.c.team_id == team_id))
+    db.session.execute(update(Player).where(Player.team_id == team_id).values(team_id=None)
+                       .execution_options(synchronize_session=False))
+    db.session.execute(delete(Notification).where(Notification.match_id.in_(match_ids)))
+    matches = db.session.execute(delete(Match).where(
+        (Match.home_team_id == team_id) | (Match.away_team_id == team_id)
+    ).execution_options(synchronize_session=False))
+    db.session.execute(delete(Team).where(Team.id == team_id).execution_options(synchronize_session=False))
+
+    # bulk statements skip the ORM hooks, so patch derived data by hand
+    conn = db.session.connection()
+    unindex(conn, 'team', [team_id])
+    unindex(conn, 'match', match_ids)
+    reindex(conn, 'player', player_ids)
+    db.session.commit()
+    reset_after_bulk_write()
+    return (f'Deleted team {name}: {matches.rowcount} matches, {follows.rowcount} follows; '
+            f'{len(player_ids)} players detached.')
+
+
+@job_handler('create_players')
+def create_players(team_id, players, added_by):
+    """Create player accounts for a team in one transaction and email invites.
+
+    `players` is a list of dicts with email, name and optional squad_number /
+    position. Passwords never go in the payload: each account gets a random
+    one (hashed here, off the request) and the player is emailed a link to
+    set their own. Emails that already exist are skipped.
+    """
+    emails = [p['email'] for p in players]
+    existing = {e for (e,) in db.session.query(User.email).filter(User.email.in_(emails))}
+    new_users = []
+    seen = set()
+    for p in players:
+        email = p['email']
+        if email in existing or email in seen:
+            continue
+        seen.add(email)
+        u = User(email=email, name=p.get('name') or email, created_by=added_by, club='')
+        u.set_password(secrets.token_urlsafe(24))
+        u.access_level = 'player'
+        new_users.append((u, p))
+    db.session.add_all([u for u, _ in new_users])
+    db.session.flush()
+    db.session.add_all([
+        Player(user_id=u.id, team_id=team_id, squad_number=p.get('squad_number') or None,
+               position=p.get('position') or None)
+        for u, p in new_users
+    ])
+    # sent before the commit: a failed commit means a retry with fresh links,
+    # rather than accounts nobody was told about
+    base = current_app.config['APP_BASE_URL'].rstrip('/')
+    send_emails([
+        (u.email, 'Your Devon RFU Colts player account',
+         f'Hi {u.name},\n\nA player account has been created for you. Set your password here '
+         f'(the link works for {PASSWORD_TOKEN_MAX_AGE // 86400} days):\n\n{base}/set-password/{u.password_token()}\n')
+        for u, _ in new_users
+    ])
+    db.session.commit()
+    skipped = len(players) - len(new_users)
+    return (f'Created {len(new_users)} players and emailed invites'
+            + (f'; skipped {skipped} existing emails.' if skipped else '.'))
@@ -0,0 +1,43 @@
+"""Outgoing email for notifications and player invites.
+
+Mail goes through MAIL_SERVER (host:port, e.g. a local SMTP relay or
+`python -m aiosmtpd -n`) when configured; otherwise each message is written
+as an .eml file to the instance `outbox/` folder.
+"""
+
+import os
+import smtplib
+from datetime import datetime
+from email.message import EmailMessage
+
+from flask import current_app
+
+MAIL_FROM = 'noreply@devonrfu.com'
+
+
+def send_emails(messages):
+    """Deliver (to, subject, body) tuples via MAIL_SERVER or the outbox folder."""
+    if not messages:
+        return 0
+    mails = []
+    for to, subject, body in messages:
+        msg = EmailMessage()
+        msg['From'] = current_app.config.get('MAIL_FROM') or MAIL_FROM
+        msg['To'] = to
+        msg['Subject'] = subject
+        msg.set_content(body)
+        mails.append(msg)
+    server = current_app.config.get('MAIL_SERVER')
+    if server:
+        host, _, port = server.partition(':')
+        with smtplib.SMTP(host, int(port or 25), timeout=30) as smtp:
+            for msg in mails:
+                smtp.send_message(msg)
+    else:
+        outbox = os.path.join(current_app.instance_path, 'outbox')
+        os.makedirs(outbox, exist_ok=True)
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')
+        for n, msg in enumerate(mails):
+            with open(os.path.join(outbox, f'{stamp}-{n}.eml'), 'wb') as fh:
+                fh.write(bytes(msg))
+    return len(mails)
@@ -0,0 +1,12 @@
+from app import app
+from extensions import db
+from models import backfill_match_columns
+
+# Recompute Match.status / result / season from the scores and dates, e.g.
+# after bulk edits that bypassed the ORM. Safe to re-run: every statement is
+# set-based. (db-upgrade.py adds and fills these columns on old databases.)
+
+with app.app_context():
+    with db.engine.begin() as conn:
+        updated = backfill_match_columns(conn)
+    print(f"Backfilled status/result for all matches and season for {updated} matches.")
@@ -1,13 +1,61 @@
 from extensions import db
+from flask import current_app
 from flask_login import UserMixin
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event, func, text
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
+# match status values
+MATCH_SCHEDULED = 'scheduled'
+MATCH_COMPLETED = 'completed'
+MATCH_POSTPONED = 'postponed'
+MATCH_STATUSES = (MATCH_SCHEDULED, MATCH_COMPLETED, MATCH_POSTPONED)
+
+# background job status values (see jobs.py)
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# seasons run August to July and are labelled like '2025-26'
+SEASON_START_MONTH = 8
+
+
+def season_for(dt):
+    """Return the season label for a match date, e.g. 2025-09-06 -> '2025-26'."""
+    start = dt.year if dt.month >= SEASON_START_MONTH else dt.year - 1
+    return f"{start}-{str(start + 1)[-2:]}"
+
+
+def season_bounds(label):
+    """Return the [start, end) datetimes covered by a season label."""
+    start = int(label.split('-')[0])
+    return datetime(start, SEASON_START_MONTH, 1), datetime(start + 1, SEASON_START_MONTH, 1)
+
+
+def result_from_scores(home_score, away_score):
+    """Home-side result ('win' | 'loss' | 'draw'), or None if unplayed."""
+    if home_score is None or away_score is None:
+        return None
+    if home_score > away_score:
+        return 'win'
+    if home_score < away_score:
+        return 'loss'
+    return 'draw'
+
+# how long an emailed set-password link stays valid (seconds)
+PASSWORD_TOKEN_MAX_AGE = 7 * 24 * 3600
+
+
+def _password_tokens():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='set-password')
+
 # association table for users tracking teams
 user_tracked_teams = db.Table(
     'user_tracked_teams',
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('team_id', db.Integer, db.ForeignKey('team.id'), primary_key=True)
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('team_id', db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), primary_key=True)
 )
 
 class User(UserMixin, db.Model):
@@ -22,9 +70,12 @@ class User(UserMixin, db.Model):
     # NOTE: removed duplicate `account_type` field — use `access_level` exclusively
     # optional club code (references Club.code)
     club_code = db.Column(db.String(64), nullable=True)
+    # also email match results for followed teams (the inbox always gets them)
+    notify_by_email = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     
     # relationship for tracked teams
-    tracked_teams = db.relationship('Team', secondary='user_tracked_teams', backref=db.backref('followers', lazy='dynamic'))
+    tracked_teams = db.relationship('Team', secondary='user_tracked_teams',
+                                    backref=db.backref('followers', lazy='dynamic', passive_deletes=True))
 
     def set_access_level(self, level):
         self.access_level = level
@@ -34,6 +85,21 @@ class User(UserMixin, db.Model):
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
+
+    def password_token(self):
+        """Signed link token for setting a password; void once the password changes."""
+        return _password_tokens().dumps({'id': self.id, 'h': self.password_hash[-16:]})
+
+    @classmethod
+    def from_password_token(cls, token, max_age=PASSWORD_TOKEN_MAX_AGE):
+        try:
+            data = _password_tokens().loads(token, max_age=max_age)
+        except BadSignature:
+            return None
+        user = db.session.get(cls, data.get('id'))
+        if user is None or user.password_hash[-16:] != data.get('h'):
+            return None
+        return user
     
     def set_name(self, name):
         self.name = name
@@ -96,10 +162,24 @@ class Team(db.Model):
     name = db.Column(db.String(200), nullable=False)
     code = db.Column(db.String(64), unique=True, nullable=True)
     logo_filename = db.Column(db.String(256), nullable=True)
+    # soft delete: archived teams drop out of listings but keep their history
+    archived_on = db.Column(db.DateTime, nullable=True, index=True)
+    # maintained by follows.py so "most followed" needn't count user_tracked_teams
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
 
     # relationships (players and coaches)
-    players = db.relationship('Player', backref='team', lazy='dynamic')
-    coaches = db.relationship('User', secondary='team_coaches', backref=db.backref('coached_teams', lazy='dynamic'))
+    # passive_deletes: children go with set-based deletes, see jobs.delete_team
+    players = db.relationship('Player', backref='team', lazy='dynamic', passive_deletes=True)
+    coaches = db.relationship('User', secondary='team_coaches', passive_deletes=True,
+                              backref=db.backref('coached_teams', lazy='dynamic'))
+
+    @classmethod
+    def active(cls):
+        """Query of teams that haven't been archived."""
+        return cls.query.filter(cls.archived_on == None)
+
+    def is_archived(self):
+        return self.archived_on is not None
 
     def __repr__(self):
         return f"<Team {self.name}>"
@@ -108,8 +188,8 @@ class Team(db.Model):
 # association table linking teams and coach users
 team_coaches = db.Table(
     'team_coaches',
-    db.Column('team_id', db.Integer, db.ForeignKey('team.id'), primary_key=True),
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    db.Column('team_id', db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
 )
 
 
@@ -117,7 +197,7 @@ class Player(db.Model):
     __tablename__ = 'player'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
-    team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='SET NULL'), nullable=True, index=True)
     squad_number = db.Column(db.String(16), nullable=True)
     position = db.Column(db.String(64), nullable=True)
     date_of_birth = db.Column(db.Date, nullable=True)
@@ -133,35 +213,111 @@ class Player(db.Model):
 class Match(db.Model):
     __tablename__ = 'match'
     id = db.Column(db.Integer, primary_key=True)
-    home_team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
-    away_team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
+    home_team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False)
+    away_team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False)
     date_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     location = db.Column(db.String(255), nullable=True)
     home_score = db.Column(db.Integer, nullable=True)
     away_score = db.Column(db.Integer, nullable=True)
+    # denormalised from the scores/date on every write (see _sync_match_columns);
+    # db-upgrade.py adds and backfills them on databases created before these existed
+    status = db.Column(db.String(16), nullable=False, default=MATCH_SCHEDULED)
+    result = db.Column(db.String(8), nullable=True)
+    season = db.Column(db.String(9), nullable=True)
 
     # relationships
-    home_team = db.relationship('Team', foreign_keys=[home_team_id], backref='home_matches')
-    away_team = db.relationship('Team', foreign_keys=[away_team_id], backref='away_matches')
+    home_team = db.relationship('Team', foreign_keys=[home_team_id],
+                                backref=db.backref('home_matches', passive_deletes=True))
+    away_team = db.relationship('Team', foreign_keys=[away_team_id],
+                                backref=db.backref('away_matches', passive_deletes=True))
+
+    __table_args__ = (
+        db.Index('ix_match_status_date_time', 'status', 'date_time'),
+        db.Index('ix_match_season_result', 'season', 'result'),
+        db.Index('ix_match_home_team_season', 'home_team_id', 'season'),
+        db.Index('ix_match_away_team_season', 'away_team_id', 'season'),
+    )
 
     def is_past(self):
-        if self.home_score is not None and self.away_score is not None:
+        if self.status == MATCH_COMPLETED:
             return True
         return self.date_time < datetime.utcnow()
 
     def result_for_home(self):
-        if self.home_score is None or self.away_score is None:
-            return None
-        if self.home_score > self.away_score:
-            return 'win'
-        if self.home_score < self.away_score:
-            return 'loss'
-        return 'draw'
+        # stored on write; fall back for objects that haven't been flushed yet
+        if self.result is not None:
+            return self.result
+        return result_from_scores(self.home_score, self.away_score)
+
+    @classmethod
+    def team_results(cls, team_id, result=None, season=None):
+        """Query completed matches for a team, optionally one result from its side.
+
+        e.g. Match.team_results(team.id, 'win', '2025-26') for this season's wins.
+        """
+        if result is None:
+            side = (cls.home_team_id == team_id) | (cls.away_team_id == team_id)
+        else:
+            flipped = {'win': 'loss', 'loss': 'win', 'draw': 'draw'}[result]
+            side = ((cls.home_team_id == team_id) & (cls.result == result)) | \
+                   ((cls.away_team_id == team_id) & (cls.result == flipped))
+        q = cls.query.filter(cls.status == MATCH_COMPLETED, side)
+        if season:
+            q = q.filter(cls.season == season)
+        return q
 
     def __repr__(self):
         return f"<Match {self.id}: {self.home_team_id} vs {self.away_team_id} @ {self.date_time}>"
 
 
+@event.listens_for(Match, 'before_insert')
+@event.listens_for(Match, 'before_update')
+def _sync_match_columns(mapper, connection, target):
+    # keep status/result/season consistent with the scores and date
+    target.result = result_from_scores(target.home_score, target.away_score)
+    if target.result is not None:
+        target.status = MATCH_COMPLETED
+    elif target.status not in (MATCH_SCHEDULED, MATCH_POSTPONED):
+        # unset, unknown, or scores cleared on a completed match
+        target.status = MATCH_SCHEDULED
+    if target.date_time is None:
+        target.date_time = datetime.utcnow()
+    target.season = season_for(target.date_time)
+
+
+def backfill_match_columns(conn):
+    """Recompute status/result/season for every match with set-based UPDATEs.
+
+    The bulk counterpart of _sync_match_columns, for rows written before the
+    columns existed. Returns the number of matches given a season.
+    """
+    # status and result straight from the scores; keep explicit postponements
+    conn.execute(text(
+        'UPDATE "match" SET '
+        "result = CASE WHEN home_score IS NULL OR away_score IS NULL THEN NULL "
+        "WHEN home_score > away_score THEN 'win' "
+        "WHEN home_score < away_score THEN 'loss' ELSE 'draw' END, "
+        "status = CASE WHEN home_score IS NOT NULL AND away_score IS NOT NULL THEN :completed "
+        "WHEN status = :postponed THEN :postponed ELSE :scheduled END"
+    ), {'completed': MATCH_COMPLETED, 'postponed': MATCH_POSTPONED, 'scheduled': MATCH_SCHEDULED})
+
+    # one ranged UPDATE per season between the earliest and latest match
+    first, last = conn.execute(db.select(func.min(Match.date_time), func.max(Match.date_time))).one()
+    updated = 0
+    if first is not None:
+        label = season_for(first)
+        while True:
+            start, end = season_bounds(label)
+            res = conn.execute(text(
+                'UPDATE "match" SET season = :season WHERE date_time >= :start AND date_time < :end'
+            ), {'season': label, 'start': start, 'end': end})
+            updated += res.rowcount
+            if end > last:
+                break
+            label = season_for(end)
+    return updated
+
+
 class Leaderboard(db.Model):
     __tablename__ = 'leaderboard'
     id = db.Column(db.Integer, primary_key=True)
@@ -183,4 +339,59 @@ class Leaderboard(db.Model):
 
     def __repr__(self):
         return f"<Leaderboard {self.id} team={self.team} rank={self.rank} pts_scored={self.pts_scored}>"
-    
+
+
+class Job(db.Model):
+    """A unit of background work queued by an admin request (see jobs.py)."""
+    __tablename__ = 'job'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(16), nullable=False, default=JOB_QUEUED)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    # earliest time a worker may pick the job up (pushed back on retry)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.String(150), nullable=True)
+    created_on = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_on = db.Column(db.DateTime, nullable=True)
+    finished_on = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+
+    def is_finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} {self.status} attempts={self.attempts}>"
+
+
+class Notification(db.Model):
+    """An inbox entry for one user, written in batches by notifications.py."""
+    __tablename__ = 'notification'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    match_id = db.Column(db.Integer, db.ForeignKey('match.id', ondelete='CASCADE'), nullable=True)
+    title = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=True)
+    created_on = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    read_on = db.Column(db.DateTime, nullable=True)
+    # set once the email copy has gone to the outbox (users with notify_by_email)
+    emailed_on = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # one entry per user per match; a corrected score replaces it
+        db.UniqueConstraint('user_id', 'match_id', name='uq_notification_user_match'),
+        db.Index('ix_notification_user_created', 'user_id', 'created_on'),
+        db.Index('ix_notification_match_emailed', 'match_id', 'emailed_on'),
+    )
+
+    def is_read(self):
+        return self.read_on is not None
+
+    def __repr__(self):
+        return f"<Notification {self.id} user={self.user_id} match={self.match_id}>"
@@ -0,0 +1,82 @@
+"""Match result notifications for followers of both teams.
+
+Saving a final score enqueues a `notify_result` job (see jobs.py), so the
+request that saved it never waits on the fan-out. The job writes one inbox
+row per follower in batches of NOTIFY_BATCH, each batch its own short
+transaction, then emails the users who opted in (see mailer.py), again in
+batches.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import delete, insert, update
+
+from extensions import db
+from jobs import job_handler
+from mailer import send_emails
+from models import Match, Notification, User, MATCH_COMPLETED, user_tracked_teams
+
+# followers written per transaction
+NOTIFY_BATCH = 1000
+# emails sent per SMTP connection / outbox pass
+EMAIL_BATCH = 200
+
+
+def result_text(match):
+    home, away = match.home_team.name, match.away_team.name
+    title = f'Full time: {home} {match.home_score} - {match.away_score} {away}'
+    body = f'{home} v {away}, {match.date_time:%a %d %b %Y} at {match.location or "TBC"}.'
+    return title, body
+
+
+def _chunks(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def unread_count(user_id):
+    return db.session.query(db.func.count(Notification.id)).filter(
+        Notification.user_id == user_id, Notification.read_on == None).scalar()
+
+
+@job_handler('notify_result')
+def notify_result(match_id, home_score, away_score):
+    """Write result notifications for every follower of either team.
+
+    Safe to retry: each batch replaces the rows it writes, and emails are
+    only sent for rows without `emailed_on`.
+    """
+    match = db.session.get(Match, match_id)
+    if match is None or match.status != MATCH_COMPLETED:
+        return 'Match no longer has a result.'
+    if (match.home_score, match.away_score) != (home_score, away_score):
+        # edited again since; the newer job sends the current score
+        return 'Score changed since this job was queued.'
+    title, body = result_text(match)
+
+    followers = [u for (u,) in db.session.query(user_tracked_teams.c.user_id).filter(
+        user_tracked_teams.c.team_id.in_([match.home_team_id, match.away_team_id])
+    ).distinct().order_by(user_tracked_teams.c.user_id)]
+    for batch in _chunks(followers, NOTIFY_BATCH):
+        now = datetime.utcnow()
+        db.session.execute(delete(Notification).where(
+            Notification.match_id == match_id, Notification.user_id.in_(batch)))
+        db.session.execute(insert(Notification), [
+            {'user_id': u, 'match_id': match_id, 'title': title, 'body': body, 'created_on': now}
+            for u in batch
+        ])
+        db.session.commit()
+
+    emailed = 0
+    while True:
+        rows = db.session.query(Notification.id, User.email).join(User, User.id == Notification.user_id).filter(
+            Notification.match_id == match_id, Notification.emailed_on == None, User.notify_by_email == True
+        ).order_by(Notification.id).limit(EMAIL_BATCH).all()
+        if not rows:
+            break
+        send_emails([(email, title, body) for _, email in rows])
+        db.session.execute(update(Notification).where(Notification.id.in_([n for n, _ in rows]))
+                           .values(emailed_on=datetime.utcnow()))
+        db.session.commit()
+        emailed += len(rows)
+    return f'Notified {len(followers)} followers; emailed {emailed}.'
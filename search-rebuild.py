@@ -0,0 +1,10 @@
+from app import app
+from extensions import db
+from search import rebuild_search_index
+
+# (Re)build the full-text search index from the team, player and match tables.
+# Safe to run on an existing database; the index is created if missing.
+with app.app_context():
+    with db.engine.begin() as conn:
+        rebuild_search_index(conn)
+    print("Search index rebuilt.")
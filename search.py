@@ -0,0 +1,323 @@
+"""Full-text search over teams, players and fixtures.
+
+A single `search_index` table holds one document per searchable row. On
+SQLite it is an FTS5 virtual table ranked with bm25(); on Postgres it is a
+plain table with a GIN-indexed tsvector column ranked with ts_rank(). Any
+other backend (or a SQLite build without FTS5) falls back to LIKE matching.
+
+The index is kept in sync from an ORM `after_flush` hook: changed ids are
+collected per flush and re-indexed with a few set-based INSERT ... SELECT
+statements, so a save never loads extra rows into the session.
+"""
+
+import re
+
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import User, Team, Match, Player
+
+INDEX_TABLE = 'search_index'
+
+# document kinds and the small integer folded into each document key
+# (doc key = ref_id * 4 + code) so updates/deletes are primary-key lookups
+KIND_CODES = {'team': 1, 'player': 2, 'match': 3}
+
+# bm25 column weights for (kind, ref_id, title, body): titles count most
+_BM25_WEIGHTS = '0.0, 0.0, 10.0, 1.0'
+
+# per-engine cache of the search mode ('fts5' | 'tsvector' | 'like')
+# and whether the index table exists yet
+_modes = {}
+_ready = {}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# SELECTs producing (doc_key, kind, ref_id, title, body), and the id column
+# used to narrow them to the rows touched by a flush
+_SOURCES = {
+    'team': (
+        "SELECT t.id * 4 + 1, 'team', t.id, t.name, COALESCE(t.code, '') "
+        "FROM team t WHERE t.archived_on IS NULL",
+        't.id',
+    ),
+    'player': (
+        "SELECT p.id * 4 + 2, 'player', p.id, u.name, "
+        "COALESCE(t.name, '') || ' ' || COALESCE(p.position, '') "
+        "FROM player p JOIN \"user\" u ON u.id = p.user_id "
+        "LEFT JOIN team t ON t.id = p.team_id",
+        'p.id',
+    ),
+    'match': (
+        "SELECT m.id * 4 + 3, 'match', m.id, COALESCE(m.location, ''), "
+        "COALESCE(h.name, '') || ' vs ' || COALESCE(a.name, '') "
+        "FROM \"match\" m LEFT JOIN team h ON h.id = m.home_team_id "
+        "LEFT JOIN team a ON a.id = m.away_team_id",
+        'm.id',
+    ),
+}
+
+
+def _source(kind, narrowed=True):
+    sql, id_col = _SOURCES[kind]
+    if not narrowed:
+        return sql
+    return f"{sql} {'AND' if ' WHERE ' in sql else 'WHERE'} {id_col} IN :ids"
+
+
+def _engine_key(bind):
+    engine = getattr(bind, 'engine', bind)
+    return str(engine.url)
+
+
+def search_mode(bind):
+    """Return which search backend is used for this engine/connection."""
+    key = _engine_key(bind)
+    if key in _modes:
+        return _modes[key]
+    dialect = bind.dialect.name
+    if dialect == 'postgresql':
+        mode = 'tsvector'
+    elif dialect == 'sqlite':
+        mode = 'like'
+        try:
+            opts = bind.exec_driver_sql('PRAGMA compile_options').scalars().all()
+            if 'ENABLE_FTS5' in opts:
+                mode = 'fts5'
+        except Exception:
+            pass
+    else:
+        mode = 'like'
+    _modes[key] = mode
+    return mode
+
+
+def _key_column(mode):
+    # FTS5 tables only have the implicit rowid as an indexed key
+    return 'rowid' if mode == 'fts5' else 'doc_id'
+
+
+def _index_ready(conn):
+    key = _engine_key(conn)
+    if not _ready.get(key):
+        _ready[key] = inspect(conn).has_table(INDEX_TABLE)
+    return _ready[key]
+
+
+def create_search_index(conn):
+    """Create the search index table (and supporting index) if missing."""
+    mode = search_mode(conn)
+    if mode == 'fts5':
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+            "kind UNINDEXED, ref_id UNINDEXED, title, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    elif mode == 'tsvector':
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+            "doc_id BIGINT PRIMARY KEY, kind VARCHAR(16) NOT NULL, "
+            "ref_id INTEGER NOT NULL, title TEXT NOT NULL, body TEXT NOT NULL, "
+            "document TSVECTOR NOT NULL)"
+        )
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{INDEX_TABLE}_document "
+            f"ON {INDEX_TABLE} USING GIN (document)"
+        )
+    else:
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+            "doc_id INTEGER PRIMARY KEY, kind VARCHAR(16) NOT NULL, "
+            "ref_id INTEGER NOT NULL, title TEXT NOT NULL, body TEXT NOT NULL)"
+        )
+    _ready[_engine_key(conn)] = True
+
+
+def _insert_docs_sql(mode, source):
+    """INSERT ... SELECT filling the index from `source` (see _SOURCES)."""
+    if mode == 'tsvector':
+        return (
+            f"INSERT INTO {INDEX_TABLE} (doc_id, kind, ref_id, title, body, document) "
+            "SELECT k, kd, r, ti, bo, to_tsvector('simple', ti || ' ' || bo) "
+            f"FROM ({source}) AS src (k, kd, r, ti, bo)"
+        )
+    return f"INSERT INTO {INDEX_TABLE} ({_key_column(mode)}, kind, ref_id, title, body) {source}"
+
+
+def _write_docs(conn, kind, ids):
+    """Replace the indexed documents of `kind` for the given ids."""
+    if not ids:
+        return
+    ids = sorted(ids)
+    _delete_docs(conn, kind, ids)
+    insert = _insert_docs_sql(search_mode(conn), _source(kind))
+    conn.execute(text(insert).bindparams(bindparam('ids', expanding=True)), {'ids': ids})
+
+
+def _delete_docs(conn, kind, ids):
+    if not ids:
+        return
+    key_col = _key_column(search_mode(conn))
+    code = KIND_CODES[kind]
+    delete = text(f"DELETE FROM {INDEX_TABLE} WHERE {key_col} IN :keys").bindparams(
+        bindparam('keys', expanding=True))
+    conn.execute(delete, {'keys': [i * 4 + code for i in sorted(ids)]})
+
+
+def _dependent_ids(conn, team_ids=(), user_ids=()):
+    """Return (player_ids, match_ids) whose documents embed renamed teams/users."""
+    player_ids, match_ids = set(), set()
+    if team_ids:
+        q = text("SELECT id FROM player WHERE team_id IN :ids").bindparams(
+            bindparam('ids', expanding=True))
+        player_ids.update(conn.execute(q, {'ids': list(team_ids)}).scalars())
+        q = text('SELECT id FROM "match" WHERE home_team_id IN :ids OR away_team_id IN :ids').bindparams(
+            bindparam('ids', expanding=True))
+        match_ids.update(conn.execute(q, {'ids': list(team_ids)}).scalars())
+    if user_ids:
+        q = text("SELECT id FROM player WHERE user_id IN :ids").bindparams(
+            bindparam('ids', expanding=True))
+        player_ids.update(conn.execute(q, {'ids': list(user_ids)}).scalars())
+    return player_ids, match_ids
+
+
+def _sync_after_flush(session, flush_context):
+    """Re-index whatever searchable rows this flush touched."""
+    changed = {'team': set(), 'player': set(), 'match': set()}
+    removed = {'team': set(), 'player': set(), 'match': set()}
+    renamed_users = set()
+    renamed_teams = set()
+
+    for obj in list(session.new) + list(session.dirty):
+        state = inspect(obj)
+        if isinstance(obj, Team):
+            changed['team'].add(obj.id)
+            if obj in session.dirty and state.attrs.name.history.has_changes():
+                renamed_teams.add(obj.id)
+        elif isinstance(obj, Match):
+            changed['match'].add(obj.id)
+        elif isinstance(obj, Player):
+            changed['player'].add(obj.id)
+        elif isinstance(obj, User) and obj in session.dirty:
+            if state.attrs.name.history.has_changes():
+                renamed_users.add(obj.id)
+    for obj in session.deleted:
+        # the row is gone: read the id from the identity key, not the attribute
+        ident = inspect(obj).identity
+        if ident is None:
+            continue
+        if isinstance(obj, Team):
+            removed['team'].add(ident[0])
+        elif isinstance(obj, Match):
+            removed['match'].add(ident[0])
+        elif isinstance(obj, Player):
+            removed['player'].add(ident[0])
+
+    if not any(changed.values()) and not any(removed.values()) and not renamed_users:
+        return
+
+    conn = session.connection()
+    if not _index_ready(conn):
+        return
+    # renaming a team or user changes the text of documents that embed it
+    renamed_teams -= removed['team']
+    if renamed_teams or renamed_users:
+        player_ids, match_ids = _dependent_ids(conn, renamed_teams, renamed_users)
+        changed['player'] |= player_ids
+        changed['match'] |= match_ids
+    for kind in KIND_CODES:
+        _delete_docs(conn, kind, removed[kind])
+        _write_docs(conn, kind, changed[kind] - removed[kind])
+
+
+def reindex(conn, kind, ids):
+    """Refresh documents for rows changed outside the ORM (bulk statements)."""
+    if ids and _index_ready(conn):
+        _write_docs(conn, kind, set(ids))
+
+
+def unindex(conn, kind, ids):
+    """Drop documents for rows deleted outside the ORM (bulk statements)."""
+    if ids and _index_ready(conn):
+        _delete_docs(conn, kind, set(ids))
+
+
+_registered = False
+
+
+def register_search_listeners():
+    """Hook index maintenance into every ORM flush (idempotent)."""
+    global _registered
+    if _registered:
+        return
+    event.listen(Session, 'after_flush', _sync_after_flush)
+    _registered = True
+
+
+def rebuild_search_index(conn):
+    """Create the index if needed and repopulate it from the base tables."""
+    create_search_index(conn)
+    conn.exec_driver_sql(f"DELETE FROM {INDEX_TABLE}")
+    mode = search_mode(conn)
+    for kind in _SOURCES:
+        # no id filter: a full rebuild is one INSERT ... SELECT per kind
+        conn.exec_driver_sql(_insert_docs_sql(mode, _source(kind, narrowed=False)))
+    if mode == 'fts5':
+        conn.exec_driver_sql(f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('optimize')")
+
+
+def _tokens(query):
+    return _TOKEN_RE.findall((query or '').lower())[:8]
+
+
+def search(query, kinds=None, limit=20):
+    """Return ranked hits for `query` as a list of dicts.
+
+    Each hit has kind, ref_id, title, body and score (higher is better).
+    Every term is prefix-matched, so 'exe sar' finds 'Exeter Saracens'.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    kinds = [k for k in (kinds or KIND_CODES) if k in KIND_CODES]
+    if not kinds:
+        return []
+    conn = db.session.connection()
+    if not _index_ready(conn):
+        return []
+    mode = search_mode(conn)
+    params = {'kinds': kinds, 'limit': int(limit)}
+
+    if mode == 'fts5':
+        params['q'] = ' '.join(f'"{t}"*' for t in tokens)
+        sql = (
+            f"SELECT kind, ref_id, title, body, -bm25({INDEX_TABLE}, {_BM25_WEIGHTS}) AS score "
+            f"FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH :q AND kind IN :kinds "
+            "ORDER BY score DESC LIMIT :limit"
+        )
+    elif mode == 'tsvector':
+        params['q'] = ' & '.join(f'{t}:*' for t in tokens)
+        sql = (
+            "SELECT kind, ref_id, title, body, ts_rank(document, q) AS score "
+            f"FROM {INDEX_TABLE}, to_tsquery('simple', :q) AS q "
+            "WHERE document @@ q AND kind IN :kinds "
+            "ORDER BY score DESC LIMIT :limit"
+        )
+    else:
+        clauses = []
+        for i, t in enumerate(tokens):
+            params[f't{i}'] = f'%{t}%'
+            clauses.append(f"(lower(title) LIKE :t{i} OR lower(body) LIKE :t{i})")
+        # title hits rank above body-only hits
+        params['t_first'] = f'%{tokens[0]}%'
+        sql = (
+            "SELECT kind, ref_id, title, body, "
+            "CASE WHEN lower(title) LIKE :t_first THEN 2 ELSE 1 END AS score "
+            f"FROM {INDEX_TABLE} WHERE {' AND '.join(clauses)} AND kind IN :kinds "
+            "ORDER BY score DESC, title LIMIT :limit"
+        )
+
+    stmt = text(sql).bindparams(bindparam('kinds', expanding=True))
+    rows = conn.execute(stmt, params).mappings().all()
+    return [dict(r) for r in rows]
@@ -0,0 +1,194 @@
+import argparse
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+# Populate a database with realistic volumes of clubs, fixtures, users,
+# players and followers for load testing. Point it at a scratch database:
+#
+#   DATABASE_URL=sqlite:///bench.db python seed-data.py --reset
+#
+# Every seeded account uses the password "password"; the superadmin is
+# bench-admin@example.com. The same --seed always produces the same data.
+
+parser = argparse.ArgumentParser(description="Seed a database with benchmark data.")
+parser.add_argument("--seasons", type=int, default=4, help="seasons of fixtures, ending with the current one")
+parser.add_argument("--division-size", type=int, default=10, help="teams per division (double round robin)")
+parser.add_argument("--users", type=int, default=5000, help="regular (follower) accounts")
+parser.add_argument("--players-per-team", type=int, default=30)
+parser.add_argument("--max-follows", type=int, default=4, help="most teams a regular user follows")
+parser.add_argument("--seed", type=int, default=42)
+parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+args = parser.parse_args()
+
+# the seeder does its own bulk inserts; no need for job workers
+os.environ.setdefault("JOB_WORKERS", "0")
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app import app
+from extensions import db
+from models import (
+    User, Team, Match, Player, Leaderboard, Job, team_coaches, user_tracked_teams,
+    JOB_DONE, MATCH_COMPLETED, MATCH_SCHEDULED, SEASON_START_MONTH, result_from_scores, season_for,
+)
+from follows import recount_followers
+from search import rebuild_search_index
+
+PASSWORD = "password"
+POSITIONS = ["Prop", "Hooker", "Lock", "Flanker", "Number 8", "Scrum-half",
+             "Fly-half", "Centre", "Wing", "Full-back"]
+FIRST_NAMES = ["Alfie", "Ben", "Charlie", "Dan", "Ed", "Finn", "George", "Harry", "Isaac", "Jack",
+               "Kai", "Leo", "Max", "Noah", "Ollie", "Reuben", "Sam", "Toby", "Will", "Zac"]
+LAST_NAMES = ["Adams", "Bennett", "Clarke", "Davies", "Evans", "Fletcher", "Green", "Hughes", "Jones",
+              "King", "Lewis", "Morgan", "Parker", "Roberts", "Smith", "Taylor", "Turner", "Walker"]
+BATCH = 2000
+
+rng = random.Random(args.seed)
+
+
+def club_name(filename):
+    # "ExeterSaracens.png" -> "Exeter Saracens"
+    stem = os.path.splitext(filename)[0]
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", stem)
+
+
+def insert_batches(table, rows):
+    for i in range(0, len(rows), BATCH):
+        db.session.execute(insert(table), rows[i:i + BATCH])
+
+
+def person_name():
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def season_fixtures(team_ids, season_start):
+    """Double round robin per division, one round each Saturday from September."""
+    fixtures = []
+    divisions = [team_ids[i:i + args.division_size] for i in range(0, len(team_ids), args.division_size)]
+    first_saturday = season_start + timedelta(days=(5 - season_start.weekday()) % 7, hours=14, minutes=30)
+    for division in divisions:
+        teams = list(division)
+        if len(teams) % 2:
+            teams.append(None)
+        n = len(teams)
+        rounds = []
+        for r in range(n - 1):
+            pairs = [(teams[i], teams[n - 1 - i]) for i in range(n // 2)]
+            rounds.append([p if r % 2 else (p[1], p[0]) for p in pairs])
+            teams.insert(1, teams.pop())
+        # second half of the season reverses home and away
+        rounds += [[(away, home) for home, away in rnd] for rnd in rounds]
+        for week, rnd in enumerate(rounds):
+            for home, away in rnd:
+                if home is not None and away is not None:
+                    fixtures.append((home, away, first_saturday + timedelta(weeks=week)))
+    return fixtures
+
+
+with app.app_context():
+    if args.reset:
+        db.drop_all()
+        db.create_all()
+    elif db.session.query(User.id).filter(User.email == "bench-admin@example.com").first():
+        # seeding twice would duplicate every fixture and collide on the seed accounts
+        sys.exit("This database has already been seeded - run with --reset to start again.")
+
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)
+
+    # clubs: one per logo in static/team-logos
+    logo_dir = os.path.join(app.root_path, "static", "team-logos")
+    logos = sorted(fn for fn in os.listdir(logo_dir) if fn.endswith(".png"))
+    existing_codes = {c for (c,) in db.session.query(Team.code)}
+    insert_batches(Team.__table__, [
+        {"name": club_name(fn), "code": os.path.splitext(fn)[0].upper()[:12], "logo_filename": fn}
+        for fn in logos if os.path.splitext(fn)[0].upper()[:12] not in existing_codes
+    ])
+    teams = Team.query.order_by(Team.id).all()
+    team_ids = [t.id for t in teams]
+    names = {t.id: t.name for t in teams}
+
+    # fixtures: `--seasons` seasons ending with the current one
+    current = int(season_for(now).split("-")[0])
+    match_rows = []
+    for year in range(current - args.seasons + 1, current + 1):
+        for home, away, when in season_fixtures(team_ids, datetime(year, SEASON_START_MONTH + 1, 1)):
+            row = {"home_team_id": home, "away_team_id": away, "date_time": when,
+                   "location": f"{names[home]} RFC",
+                   "home_score": None, "away_score": None, "status": MATCH_SCHEDULED,
+                   "result": None, "season": season_for(when)}
+            if when < now:
+                row["home_score"] = rng.randint(0, 45)
+                row["away_score"] = rng.randint(0, 40)
+                row["status"] = MATCH_COMPLETED
+                row["result"] = result_from_scores(row["home_score"], row["away_score"])
+            match_rows.append(row)
+    insert_batches(Match.__table__, match_rows)
+
+    # accounts: a superadmin, one coach per club, players and regular followers
+    base = db.session.query(db.func.coalesce(db.func.max(User.id), 0)).scalar()
+    user_rows = [{"email": "bench-admin@example.com", "name": "Bench Admin", "access_level": "superadmin"}]
+    user_rows += [{"email": f"coach{t}@example.com", "name": person_name(), "access_level": "coach"} for t in team_ids]
+    player_count = args.players_per_team * len(team_ids)
+    user_rows += [{"email": f"player{n}@example.com", "name": person_name(), "access_level": "player"}
+                  for n in range(player_count)]
+    user_rows += [{"email": f"user{n}@example.com", "name": person_name(), "access_level": "regular"}
+                  for n in range(args.users)]
+    for row in user_rows:
+        row.update(password_hash=password_hash, created_by="seed", club="N/A")
+    insert_batches(User.__table__, user_rows)
+
+    ids = {email: uid for uid, email in db.session.query(User.id, User.email).filter(User.id > base)}
+    insert_batches(team_coaches, [{"team_id": t, "user_id": ids[f"coach{t}@example.com"]} for t in team_ids])
+    insert_batches(Player.__table__, [
+        {"user_id": ids[f"player{n}@example.com"], "team_id": team_ids[n % len(team_ids)],
+         "squad_number": str(n // len(team_ids) + 1), "position": rng.choice(POSITIONS), "joined_on": now}
+        for n in range(player_count)
+    ])
+    # some clubs are far more popular than others
+    weights = [1.0 / (rank + 1) for rank in range(len(team_ids))]
+    rng.shuffle(weights)
+    follows = set()
+    for n in range(args.users):
+        uid = ids[f"user{n}@example.com"]
+        for team_id in rng.choices(team_ids, weights=weights, k=rng.randint(0, args.max_follows)):
+            follows.add((uid, team_id))
+    insert_batches(user_tracked_teams, [{"user_id": u, "team_id": t} for u, t in sorted(follows)])
+    recount_followers(db.session.connection())
+
+    # current season standings: 4 for a win, 2 for a draw
+    table = {t.id: {"team": t.name, "pl": 0, "w": 0, "d": 0, "l": 0, "pts_f": 0, "pts_ag": 0} for t in teams}
+    for m in match_rows:
+        if m["season"] != season_for(now) or m["status"] != MATCH_COMPLETED:
+            continue
+        for team_id, pf, pa in ((m["home_team_id"], m["home_score"], m["away_score"]),
+                                (m["away_team_id"], m["away_score"], m["home_score"])):
+            r = table[team_id]
+            r["pl"] += 1
+            r["pts_f"] += pf
+            r["pts_ag"] += pa
+            r["w" if pf > pa else ("l" if pf < pa else "d")] += 1
+    standings = []
+    for r in table.values():
+        total = 4 * r["w"] + 2 * r["d"]
+        standings.append(dict(r, pts_diff=r["pts_f"] - r["pts_ag"], g_pts=total, b_pts=0,
+                              total=total, pts_scored=total))
+    standings.sort(key=lambda r: (-r["pts_scored"], -r["pts_diff"]))
+    for rank, r in enumerate(standings, start=1):
+        r["rank"] = rank
+    insert_batches(Leaderboard.__table__, standings)
+    # the ranking above as a finished job, so the job pages have a record to show
+    db.session.add(Job(kind="recompute_ranks", status=JOB_DONE, attempts=1, created_by="seed",
+                       result=f"Ranked {len(standings)} leaderboard rows.", started_on=now, finished_on=now))
+    db.session.commit()
+
+    # bulk inserts bypass the ORM hooks, so rebuild the search index in one go
+    with db.engine.begin() as conn:
+        rebuild_search_index(conn)
+
+    print(f"Seeded {len(teams)} teams, {len(match_rows)} matches, {len(user_rows)} users "
+          f"({player_count} players), {len(follows)} follows, {len(standings)} leaderboard rows.")
@@ -0,0 +1,424 @@
+"""Team statistics for the Stats Centre.
+
+All completed matches are fetched as plain tuples in a single query and
+folded into per-team and per-pairing aggregates in one pass (form, home/away
+splits, averages, streaks and head-to-head records). The result is cached
+and only rebuilt when the match data changes, so page renders never run a
+query per team.
+
+`RecentIndex` keeps the last few results per team and per pairing and is
+patched in place as scores are saved, so fixture lists can be annotated
+with form and recent meetings by dictionary lookup.
+"""
+
+import threading
+import time
+from bisect import insort
+from collections import deque
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Team, Match, MATCH_COMPLETED, result_from_scores
+
+# number of recent results shown as "form"
+FORM_LENGTH = 5
+# number of recent meetings kept per pairing
+MEETINGS_LENGTH = 5
+# other worker processes can't bump our version, so cap staleness too
+CACHE_TTL = 60
+# the recent-results index is patched in place, so it can live longer
+RECENT_INDEX_TTL = 300
+
+_version = 0
+_cache = {'version': None, 'built_at': 0.0, 'stats': None}
+
+
+def _record():
+    return {'played': 0, 'won': 0, 'drawn': 0, 'lost': 0, 'pts_for': 0, 'pts_against': 0}
+
+
+def _add_result(rec, scored, conceded):
+    rec['played'] += 1
+    rec['pts_for'] += scored
+    rec['pts_against'] += conceded
+    if scored > conceded:
+        rec['won'] += 1
+    elif scored < conceded:
+        rec['lost'] += 1
+    else:
+        rec['drawn'] += 1
+
+
+def _new_team():
+    team = _record()
+    team.update({
+        'home': _record(),
+        'away': _record(),
+        'form': deque(maxlen=FORM_LENGTH),
+        'streak_kind': None,
+        'streak_len': 0,
+        'longest_win_streak': 0,
+    })
+    return team
+
+
+# home-side result -> form letter
+_OUTCOMES = {'win': 'W', 'loss': 'L', 'draw': 'D'}
+
+
+def _outcome(scored, conceded):
+    """'W', 'D' or 'L' from one side's point of view."""
+    return _OUTCOMES[result_from_scores(scored, conceded)]
+
+
+def _meeting_entry(match_id, home_id, away_id, date_time, hs, aws):
+    return {
+        'match_id': match_id, 'date_time': date_time,
+        'home_team_id': home_id, 'away_team_id': away_id,
+        'home_score': hs, 'away_score': aws,
+    }
+
+
+def _team_entry(team_id, match_id, home_id, away_id, date_time, hs, aws):
+    """One team's view of a completed match row."""
+    home = team_id == home_id
+    scored, conceded = (hs, aws) if home else (aws, hs)
+    return {
+        'match_id': match_id, 'date_time': date_time,
+        'opponent_id': away_id if home else home_id,
+        'scored': scored, 'conceded': conceded,
+        'outcome': _outcome(scored, conceded),
+    }
+
+
+def pair_key(team_a, team_b):
+    """Unordered key for a pairing of two team ids."""
+    return (team_a, team_b) if team_a <= team_b else (team_b, team_a)
+
+
+def _new_pair(key):
+    return {
+        'teams': key,
+        'played': 0,
+        'wins': {key[0]: 0, key[1]: 0},
+        'drawn': 0,
+        'points': {key[0]: 0, key[1]: 0},
+        'meetings': deque(maxlen=MEETINGS_LENGTH),
+    }
+
+
+def _completed_rows():
+    # plain tuples, oldest first, so the fold below sees results in order
+    return db.session.query(
+        Match.id, Match.home_team_id, Match.away_team_id, Match.date_time,
+        Match.home_score, Match.away_score,
+    ).filter(
+        Match.status == MATCH_COMPLETED,
+    ).order_by(Match.date_time.asc(), Match.id.asc()).all()
+
+
+def compute_stats(rows):
+    """Fold completed match rows into team and pairing aggregates.
+
+    `rows` are (id, home_id, away_id, date_time, home_score, away_score)
+    tuples ordered oldest first.
+    """
+    teams = {}
+    pairs = {}
+    for match_id, home_id, away_id, date_time, hs, aws in rows:
+        for team_id, venue, scored, conceded in ((home_id, 'home', hs, aws), (away_id, 'away', aws, hs)):
+            t = teams.get(team_id)
+            if t is None:
+                t = teams[team_id] = _new_team()
+            _add_result(t, scored, conceded)
+            _add_result(t[venue], scored, conceded)
+            outcome = _outcome(scored, conceded)
+            t['form'].append(outcome)
+            if outcome == t['streak_kind']:
+                t['streak_len'] += 1
+            else:
+                t['streak_kind'], t['streak_len'] = outcome, 1
+            if outcome == 'W' and t['streak_len'] > t['longest_win_streak']:
+                t['longest_win_streak'] = t['streak_len']
+
+        key = pair_key(home_id, away_id)
+        p = pairs.get(key)
+        if p is None:
+            p = pairs[key] = _new_pair(key)
+        p['played'] += 1
+        p['points'][home_id] += hs
+        p['points'][away_id] += aws
+        if hs > aws:
+            p['wins'][home_id] += 1
+        elif hs < aws:
+            p['wins'][away_id] += 1
+        else:
+            p['drawn'] += 1
+        p['meetings'].append(_meeting_entry(match_id, home_id, away_id, date_time, hs, aws))
+
+    for t in teams.values():
+        played = t['played']
+        t['avg_for'] = round(t['pts_for'] / played, 1) if played else 0.0
+        t['avg_against'] = round(t['pts_against'] / played, 1) if played else 0.0
+        t['pts_diff'] = t['pts_for'] - t['pts_against']
+        # most recent first for display
+        t['form'] = list(reversed(t['form']))
+        t['streak'] = f"{t['streak_kind']}{t['streak_len']}" if t['streak_kind'] else ''
+    for p in pairs.values():
+        p['meetings'] = list(reversed(p['meetings']))
+    return {'teams': teams, 'pairs': pairs}
+
+
+def get_stats():
+    """Return cached stats, rebuilding when match data has changed."""
+    now = time.monotonic()
+    if (_cache['stats'] is not None and _cache['version'] == _version
+            and now - _cache['built_at'] < CACHE_TTL):
+        return _cache['stats']
+    version = _version
+    stats = compute_stats(_completed_rows())
+    _cache.update(version=version, built_at=now, stats=stats)
+    return stats
+
+
+def team_stats(team_id, stats=None):
+    stats = stats or get_stats()
+    return stats['teams'].get(team_id)
+
+
+def head_to_head(team_a, team_b, stats=None):
+    """Return the pairing record for two teams, or None if they've not met."""
+    stats = stats or get_stats()
+    return stats['pairs'].get(pair_key(team_a, team_b))
+
+
+def _completed_filter():
+    return (Match.status == MATCH_COMPLETED,)
+
+
+def _recent_columns():
+    return (Match.id, Match.home_team_id, Match.away_team_id, Match.date_time,
+            Match.home_score, Match.away_score)
+
+
+class RecentIndex:
+    """Last few completed results per team and per unordered team pairing.
+
+    Lists are kept oldest first, keyed by (date_time, match_id). Saving a
+    match removes its old entries and inserts the new ones; when removing
+    an entry shortens a full list, that list is reloaded lazily (one small
+    query) on its next lookup.
+    """
+
+    def __init__(self, size=FORM_LENGTH):
+        self.size = size
+        # keep one spare so a fixture can exclude itself and still show `size`
+        self.keep = size + 1
+        self.pairs = {}
+        self.teams = {}
+        self.stale_pairs = set()
+        self.stale_teams = set()
+        self.built_at = 0.0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _sort_key(entry):
+        return (entry['date_time'], entry['match_id'])
+
+    def _push(self, lst, entry):
+        insort(lst, entry, key=self._sort_key)
+        if len(lst) > self.keep:
+            del lst[0]
+
+    def _insert(self, *row):
+        match_id, home_id, away_id = row[:3]
+        self._push(self.pairs.setdefault(pair_key(home_id, away_id), []), _meeting_entry(*row))
+        for team_id in (home_id, away_id):
+            self._push(self.teams.setdefault(team_id, []), _team_entry(team_id, *row))
+
+    def _discard(self, match_id, home_id, away_id):
+        targets = [(self.pairs, pair_key(home_id, away_id), self.stale_pairs),
+                   (self.teams, home_id, self.stale_teams),
+                   (self.teams, away_id, self.stale_teams)]
+        for store, key, stale in targets:
+            lst = store.get(key)
+            if not lst:
+                continue
+            kept = [e for e in lst if e['match_id'] != match_id]
+            if len(kept) != len(lst):
+                # a full list may have had older results trimmed off
+                if len(lst) == self.keep:
+                    stale.add(key)
+                store[key] = kept
+
+    def build(self, rows):
+        """Rebuild from (id, home_id, away_id, date_time, hs, as) rows, oldest first."""
+        with self.lock:
+            self.pairs, self.teams = {}, {}
+            self.stale_pairs, self.stale_teams = set(), set()
+            for row in rows:
+                self._insert(*row)
+            self.built_at = time.monotonic()
+
+    def apply(self, changes):
+        """Patch the index from saved match snapshots.
+
+        Each change is (match_id, old_team_ids, new_row) where new_row is
+        None for a deleted or not-yet-played match.
+        """
+        with self.lock:
+            for match_id, old_team_ids, new_row in changes:
+                for home_id, away_id in old_team_ids:
+                    if home_id is not None and away_id is not None:
+                        self._discard(match_id, home_id, away_id)
+                if new_row is not None:
+                    self._insert(*new_row)
+
+    def _refresh_stale(self):
+        if not (self.stale_pairs or self.stale_teams):
+            return
+        with self.lock:
+            for a, b in list(self.stale_pairs):
+                rows = db.session.query(*_recent_columns()).filter(
+                    *_completed_filter(),
+                    ((Match.home_team_id == a) & (Match.away_team_id == b))
+                    | ((Match.home_team_id == b) & (Match.away_team_id == a)),
+                ).order_by(Match.date_time.desc(), Match.id.desc()).limit(self.keep).all()
+                self.pairs[(a, b)] = []
+                for row in reversed(rows):
+                    self._push(self.pairs[(a, b)], _meeting_entry(*row))
+            for team_id in list(self.stale_teams):
+                rows = db.session.query(*_recent_columns()).filter(
+                    *_completed_filter(),
+                    (Match.home_team_id == team_id) | (Match.away_team_id == team_id),
+                ).order_by(Match.date_time.desc(), Match.id.desc()).limit(self.keep).all()
+                self.teams[team_id] = []
+                for row in reversed(rows):
+                    self._push(self.teams[team_id], _team_entry(team_id, *row))
+            self.stale_pairs.clear()
+            self.stale_teams.clear()
+
+    def meetings(self, team_a, team_b, exclude=None):
+        """Most recent meetings of two teams, newest first."""
+        lst = self.pairs.get(pair_key(team_a, team_b), [])
+        return [e for e in reversed(lst) if e['match_id'] != exclude][:self.size]
+
+    def form(self, team_id, exclude=None):
+        """Most recent results for a team, newest first."""
+        lst = self.teams.get(team_id, [])
+        return [e for e in reversed(lst) if e['match_id'] != exclude][:self.size]
+
+
+_recent = RecentIndex()
+
+
+def recent_index():
+    """Return the recent-results index, building or refreshing it as needed."""
+    if not _recent.built_at or time.monotonic() - _recent.built_at >= RECENT_INDEX_TTL:
+        _recent.build(db.session.query(*_recent_columns()).filter(
+            *_completed_filter()).order_by(Match.date_time.asc(), Match.id.asc()).all())
+    _recent._refresh_stale()
+    return _recent
+
+
+def annotate_fixtures(matches):
+    """Map match id -> recent meetings and both teams' form for a page of fixtures.
+
+    Meetings and form exclude the fixture itself, so past results show the
+    record going into that match's listing rather than repeating it.
+    """
+    index = recent_index()
+    notes = {}
+    for m in matches:
+        if m is None:
+            continue
+        notes[m.id] = {
+            'meetings': index.meetings(m.home_team_id, m.away_team_id, exclude=m.id),
+            'home_form': index.form(m.home_team_id, exclude=m.id),
+            'away_form': index.form(m.away_team_id, exclude=m.id),
+        }
+    return notes
+
+
+def invalidate_stats():
+    global _version
+    _version += 1
+
+
+def reset_after_bulk_write():
+    """Drop cached stats and the recent-results index after bulk (non-ORM) writes."""
+    invalidate_stats()
+    with _recent.lock:
+        _recent.built_at = 0.0
+
+
+def _old_value(state, attr):
+    hist = state.attrs[attr].history
+    if hist.deleted:
+        return hist.deleted[0]
+    return getattr(state.obj(), attr)
+
+
+def _note_deletes(session, flush_context, instances):
+    # read deleted matches' teams while their rows still exist
+    changes = session.info.setdefault('recent_changes', {})
+    for obj in session.deleted:
+        if isinstance(obj, (Match, Team)):
+            session.info['stats_dirty'] = True
+        if isinstance(obj, Match):
+            old_ids, _ = changes.get(obj.id, (set(), None))
+            old_ids.add((_old_value(inspect(obj), 'home_team_id'), _old_value(inspect(obj), 'away_team_id')))
+            old_ids.add((obj.home_team_id, obj.away_team_id))
+            changes[obj.id] = (old_ids, None)
+
+
+def _note_flush(session, flush_context):
+    # snapshot saved matches for the recent-results index; SQL can't be
+    # issued from after_commit, so capture everything needed here
+    changes = session.info.setdefault('recent_changes', {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Team):
+            session.info['stats_dirty'] = True
+        if not isinstance(obj, Match) or obj in session.deleted:
+            continue
+        session.info['stats_dirty'] = True
+        state = inspect(obj)
+        old_ids, _ = changes.get(obj.id, (set(), None))
+        old_ids.add((_old_value(state, 'home_team_id'), _old_value(state, 'away_team_id')))
+        old_ids.add((obj.home_team_id, obj.away_team_id))
+        new_row = None
+        if obj.home_score is not None and obj.away_score is not None:
+            new_row = (obj.id, obj.home_team_id, obj.away_team_id, obj.date_time,
+                       obj.home_score, obj.away_score)
+        changes[obj.id] = (old_ids, new_row)
+
+
+def _bump_on_commit(session):
+    # bump only once the data is visible to other sessions
+    if session.info.pop('stats_dirty', False):
+        invalidate_stats()
+    changes = session.info.pop('recent_changes', None)
+    if changes and _recent.built_at:
+        _recent.apply([(match_id, old_ids, new_row) for match_id, (old_ids, new_row) in changes.items()])
+
+
+def _discard_on_rollback(session):
+    session.info.pop('stats_dirty', None)
+    session.info.pop('recent_changes', None)
+
+
+_registered = False
+
+
+def register_stats_listeners():
+    """Keep the stats cache and recent-results index in step with writes (idempotent)."""
+    global _registered
+    if _registered:
+        return
+    event.listen(Session, 'before_flush', _note_deletes)
+    event.listen(Session, 'after_flush', _note_flush)
+    event.listen(Session, 'after_commit', _bump_on_commit)
+    event.listen(Session, 'after_rollback', _discard_on_rollback)
+    _registered = True